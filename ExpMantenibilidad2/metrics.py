@@ -0,0 +1,251 @@
+# ExpMantenibilidad2/metrics.py
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+# Per-process metrics; with several workers each one is scraped separately
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A labelled metric family; one value (or histogram) per label combination"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            for label_values, value in items:
+                lines.extend(self._render_sample(label_values, value))
+        return lines
+
+    def _render_sample(self, label_values, value):
+        return [f'{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}']
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                # Per-bucket counts (last one is +Inf), sum, count
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_sample(self, label_values, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labels, label_values, [('le', _format_value(float(bound)))])
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labels, label_values)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter('http_requests_total', 'HTTP requests by view, method and status',
+                                 ('view', 'method', 'status'))
+http_duration = registry.histogram('http_request_duration_seconds', 'Time to produce a response, by view',
+                                   ('view', 'method'))
+http_in_flight = registry.gauge('http_requests_in_flight', 'Requests currently being handled')
+db_queries = registry.histogram('db_queries_per_request', 'Database queries run per request, by view',
+                                ('view',), buckets=QUERY_COUNT_BUCKETS)
+db_query_duration = registry.histogram('db_query_duration_seconds_per_request',
+                                       'Time spent in database queries per request, by view', ('view',))
+upstream_duration = registry.histogram('upstream_request_duration_seconds',
+                                       'Bulkhead calls to the database servers, by upstream and route',
+                                       ('upstream', 'route'))
+upstream_errors = registry.counter('upstream_errors_total',
+                                   'Failed upstream calls by upstream and kind (connection, 5xx)',
+                                   ('upstream', 'kind'))
+upstream_in_flight = registry.gauge('upstream_requests_in_flight', 'Upstream calls in progress',
+                                    ('upstream',))
+upstream_concurrency_limit = registry.gauge('upstream_concurrency_limit',
+                                            'Current adaptive concurrency limit per upstream host',
+                                            ('upstream', 'host'))
+bulkhead_rejections = registry.counter('bulkhead_rejections_total',
+                                       'Requests rejected before reaching an upstream, by reason',
+                                       ('reason',))
+
+# [query count, query seconds] of the request being handled in this context
+_query_stats = ContextVar('query_stats', default=None)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # Context variables follow requests into sync_to_async threads, so this
+    # attributes queries to the right request in async views as well
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+if METRICS_ENABLED:
+    connection_created.connect(install_query_recorder)
+
+
+class MetricsMiddleware:
+    """Records request counts, latency, in-flight requests and DB usage per view"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not METRICS_ENABLED:
+            return self.get_response(request)
+        token, started = self._begin()
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            self._end(request, token, started, response)
+        return response
+
+    async def __acall__(self, request):
+        if not METRICS_ENABLED:
+            return await self.get_response(request)
+        token, started = self._begin()
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._end(request, token, started, response)
+        return response
+
+    def _begin(self):
+        http_in_flight.inc()
+        return _query_stats.set([0, 0.0]), time.perf_counter()
+
+    def _end(self, request, token, started, response):
+        duration = time.perf_counter() - started
+        query_count, query_seconds = _query_stats.get()
+        _query_stats.reset(token)
+        http_in_flight.dec()
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        status = response.status_code if response is not None else 500
+        http_requests.inc(view, request.method, str(status))
+        http_duration.observe(duration, view, request.method)
+        db_queries.observe(query_count, view)
+        db_query_duration.observe(query_seconds, view)
+
+
+def metrics_view(request):
+    """Prometheus text exposition of this process's metrics"""
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -1,5 +1,6 @@
 # ExpMantenibilidad2/settings.py
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -13,57 +14,84 @@ DEBUG = os.environ.get('DEBUG', 'False').lower() == 'true'
 
 ALLOWED_HOSTS = ['*']  # Configure appropriately for production
 
-# Application definition
-INSTALLED_APPS = [
-    'django.contrib.admin',
-    'django.contrib.auth',
-    'django.contrib.contenttypes',
-    'django.contrib.sessions',
-    'django.contrib.messages',
-    'django.contrib.staticfiles',
-    'bulkhead',
-    'database',
-]
-
-MIDDLEWARE = [
-    'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
-]
-
-ROOT_URLCONF = 'ExpMantenibilidad2.urls'
+# Server role: 'bulkhead', 'write', 'read' or 'both' (writes and reads on one database)
+SERVER_TYPE = os.environ.get('SERVER_TYPE', 'bulkhead')
 
-TEMPLATES = [
-    {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
-        'APP_DIRS': True,
-        'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.debug',
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-            ],
+# 'slim' installs only what the role serves; 'full' restores admin, auth,
+# sessions, messages and the complete middleware stack on every role
+SETTINGS_PROFILE = os.environ.get('SETTINGS_PROFILE', 'slim').lower()
+
+if SETTINGS_PROFILE == 'full':
+    # Application definition
+    INSTALLED_APPS = [
+        'django.contrib.admin',
+        'django.contrib.auth',
+        'django.contrib.contenttypes',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+        'bulkhead',
+        'database',
+    ]
+
+    MIDDLEWARE = [
+        'ExpMantenibilidad2.metrics.MetricsMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    ]
+
+    TEMPLATES = [
+        {
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [],
+            'APP_DIRS': True,
+            'OPTIONS': {
+                'context_processors': [
+                    'django.template.context_processors.debug',
+                    'django.template.context_processors.request',
+                    'django.contrib.auth.context_processors.auth',
+                    'django.contrib.messages.context_processors.messages',
+                ],
+            },
         },
-    },
-]
+    ]
+else:
+    # The JSON APIs use no sessions, users, CSRF tokens, messages or templates.
+    # Both apps stay installed so every role shares one set of models.
+    INSTALLED_APPS = [
+        'bulkhead',
+        'database',
+    ]
+
+    MIDDLEWARE = [
+        'ExpMantenibilidad2.metrics.MetricsMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'django.middleware.common.CommonMiddleware',
+    ]
+
+    TEMPLATES = []
+
+# Only the URLconf of the role's own app is loaded in the slim profile
+ROOT_URLCONF = 'ExpMantenibilidad2.urls'
 
 WSGI_APPLICATION = 'ExpMantenibilidad2.wsgi.application'
 
-# Database configuration
-SERVER_TYPE = os.environ.get('SERVER_TYPE', 'bulkhead')
+# Database configuration (DATABASE_PATH overrides the per-role SQLite file)
+# Seconds a worker keeps its connection open between requests (0 closes it after each one)
+CONN_MAX_AGE = int(os.environ.get('CONN_MAX_AGE', 600))
 
 if SERVER_TYPE == 'write':
     # Write server uses SQLite for WriteData
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'write_db.sqlite3',
+            'NAME': os.environ.get('DATABASE_PATH', BASE_DIR / 'write_db.sqlite3'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
         }
     }
 elif SERVER_TYPE == 'read':
@@ -71,7 +99,8 @@ elif SERVER_TYPE == 'read':
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'read_db.sqlite3',
+            'NAME': os.environ.get('DATABASE_PATH', BASE_DIR / 'read_db.sqlite3'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
         }
     }
 else:
@@ -79,10 +108,21 @@ else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'bulkhead_db.sqlite3',
+            'NAME': os.environ.get('DATABASE_PATH', BASE_DIR / 'bulkhead_db.sqlite3'),
+            'CONN_MAX_AGE': CONN_MAX_AGE,
         }
     }
 
+# Read node snapshot mode: open the file read-only and immutable (see database/storage.py)
+if SERVER_TYPE == 'read' and os.environ.get('SQLITE_READ_ONLY', '').lower() == 'immutable':
+    DATABASES['default']['NAME'] = f"file:{DATABASES['default']['NAME']}?mode=ro&immutable=1"
+    DATABASES['default']['OPTIONS'] = {'uri': True}
+
+# Migrations are generated at deploy time (makemigrations), so the test
+# database is created straight from the models instead
+if sys.argv[1:2] == ['test']:
+    MIGRATION_MODULES = {'bulkhead': None, 'database': None}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -1,10 +1,25 @@
 # ExpMantenibilidad2/urls.py
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
+from .metrics import metrics_view
+
+FULL_PROFILE = settings.SETTINGS_PROFILE == 'full'
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
-    path('bulkhead/', include('bulkhead.urls')),
-    path('database/', include('database.urls')),
-    path('', include('bulkhead.urls')),  # Default to bulkhead
-]
\ No newline at end of file
+    path('metrics', metrics_view, name='metrics'),
+]
+
+if FULL_PROFILE:
+    from django.contrib import admin
+    urlpatterns.append(path('admin/', admin.site.urls))
+
+# Slim profile: database servers do not import the proxy views and vice versa;
+# 'both' (one server for writes and reads) keeps every route like the full profile
+if FULL_PROFILE or settings.SERVER_TYPE in ('write', 'read', 'both'):
+    urlpatterns.append(path('database/', include('database.urls')))
+
+if FULL_PROFILE or settings.SERVER_TYPE not in ('write', 'read'):
+    urlpatterns += [
+        path('bulkhead/', include('bulkhead.urls')),
+        path('', include('bulkhead.urls')),  # Default to bulkhead
+    ]
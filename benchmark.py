@@ -0,0 +1,341 @@
+# benchmark.py
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ROLES = ('write', 'read', 'bulkhead')
+
+# Left out of the copy of the source tree the cluster runs from
+SOURCE_IGNORE = shutil.ignore_patterns('.git', '__pycache__', '*.sqlite3*', '*.generation', '*.log',
+                                       'benchmark_results.json')
+OPERATIONS = ('get', 'post', 'toggle')
+
+# Only these leave the system worse off; 503s (disabled or overloaded) are rejections
+TRANSPORT_ERROR = 'error'
+
+
+def parse_mix(value):
+    """Parse ``get=90,post=9,toggle=1`` into operation weights"""
+    weights = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip().lower()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f'Unknown operation: {name}. Use {", ".join(OPERATIONS)}')
+        weights[name] = float(weight or 1)
+    if not any(weights.values()):
+        raise argparse.ArgumentTypeError('At least one operation needs a positive weight')
+    return weights
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Cluster:
+    """The three roles running as local processes, each with its own SQLite file"""
+
+    def __init__(self, workdir, base_port, server, workers, threads, proxy_mode, replicate):
+        self.workdir = workdir
+        # Migrations are generated into this copy, never into the working tree
+        self.source = os.path.join(workdir, 'src')
+        self.ports = {'bulkhead': base_port, 'write': base_port + 1, 'read': base_port + 2}
+        self.server = server
+        self.workers = workers
+        self.threads = threads
+        self.proxy_mode = proxy_mode
+        self.replicate = replicate
+        self.processes = []
+
+    def host(self, role):
+        return f'127.0.0.1:{self.ports[role]}'
+
+    def env(self, role):
+        env = dict(os.environ,
+                   SERVER_TYPE=role,
+                   DATABASE_PATH=os.path.join(self.workdir, f'{role}_db.sqlite3'),
+                   SERVICE_STATUS_GENERATION_FILE=os.path.join(self.workdir, 'bulkhead_status.generation'),
+                   WRITE_DB_IP=self.host('write'),
+                   READ_DB_IP=self.host('read'),
+                   REPLICATION_SOURCE=self.host('write'),
+                   BULKHEAD_PROXY_MODE=self.proxy_mode)
+        env.pop('READ_DB_IPS', None)
+        return env
+
+    def run(self, role, *args):
+        """Run a one-off command for a role and fail loudly if it fails"""
+        with open(os.path.join(self.workdir, f'{role}.setup.log'), 'a') as log:
+            subprocess.run([sys.executable, *args], cwd=self.workdir, env=self.env(role),
+                           stdout=log, stderr=subprocess.STDOUT, check=True)
+
+    def script(self, name):
+        return os.path.join(self.source, name)
+
+    def prepare(self, rows, seed):
+        shutil.copytree(BASE_DIR, self.source, ignore=SOURCE_IGNORE, dirs_exist_ok=True)
+        # Same as deployment.yaml: migrations are generated, not committed
+        self.run('bulkhead', self.script('manage.py'), 'makemigrations', 'bulkhead', 'database')
+        for role in ROLES:
+            print(f'Migrating and seeding {role} ({rows} rows)...', flush=True)
+            self.run(role, self.script('manage.py'), 'migrate', '--verbosity', '0')
+            self.run(role, self.script('populate_db.py'), '--rows', str(rows), '--seed', str(seed))
+
+    def server_command(self, role):
+        bind = self.host(role)
+        if role == 'bulkhead' and self.proxy_mode == 'async':
+            return [sys.executable, '-m', 'uvicorn', 'ExpMantenibilidad2.asgi:application',
+                    '--app-dir', self.source, '--host', '127.0.0.1', '--port', str(self.ports[role]),
+                    '--workers', str(self.workers), '--no-access-log']
+        if self.server == 'gunicorn':
+            return [sys.executable, '-m', 'gunicorn', 'ExpMantenibilidad2.wsgi:application',
+                    '--pythonpath', self.source, '--bind', bind,
+                    '--workers', str(self.workers), '--threads', str(self.threads)]
+        return [sys.executable, self.script('manage.py'), 'runserver', bind, '--noreload']
+
+    def spawn(self, role, command):
+        log = open(os.path.join(self.workdir, f'{role}.log'), 'w')
+        process = subprocess.Popen(command, cwd=self.workdir, env=self.env(role),
+                                   stdout=log, stderr=subprocess.STDOUT)
+        self.processes.append((process, log))
+        return process
+
+    def start(self, timeout=30):
+        for role in ('write', 'read', 'bulkhead'):
+            self.spawn(role, self.server_command(role))
+        if self.replicate:
+            self.spawn('replicate', [sys.executable, self.script('manage.py'), 'replicate'])
+        self.wait_until_ready(timeout)
+
+    def wait_until_ready(self, timeout):
+        checks = {
+            'write': f'http://{self.host("write")}/database/health/',
+            'read': f'http://{self.host("read")}/database/health/',
+            'bulkhead': f'http://{self.host("bulkhead")}/bulkhead/status/',
+        }
+        deadline = time.monotonic() + timeout
+        for role, url in checks.items():
+            while True:
+                try:
+                    if requests.get(url, timeout=1).status_code == 200:
+                        break
+                except requests.RequestException:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f'{role} did not start; see {self.workdir}/{role}.log')
+                time.sleep(0.2)
+
+    def stop(self):
+        for process, _ in self.processes:
+            process.terminate()
+        for process, log in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            log.close()
+        self.processes = []
+
+
+class LoadGenerator:
+    """Closed-loop clients issuing a weighted mix of operations against the bulkhead"""
+
+    def __init__(self, bulkhead, mix, concurrency, duration, warmup, seed, page_size, pages):
+        self.base_url = f'http://{bulkhead}/bulkhead/'
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+        self.page_size = page_size
+        self.pages = pages
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+        # Toggles flip a service off and straight back on; one pair at a time keeps the end state enabled
+        self.toggle_lock = threading.Lock()
+
+    def request(self, session, operation, rng):
+        if operation == 'get':
+            page = rng.randint(1, self.pages)
+            return [session.get(self.base_url, params={'page': page, 'page_size': self.page_size}, timeout=30)]
+        if operation == 'post':
+            body = {'title': f'Benchmark {rng.randrange(10 ** 9)}', 'content': 'Registro de carga ' * rng.randint(1, 20)}
+            return [session.post(self.base_url, json=body, timeout=30)]
+        with self.toggle_lock:
+            service = {'service_name': rng.choice(['GET', 'POST'])}
+            return [session.post(f'{self.base_url}toggle/', json=service, timeout=30) for _ in range(2)]
+
+    def client(self, index, started, stop_at):
+        rng = random.Random(f'{self.seed}:{index}')
+        session = requests.Session()
+        measure_from = started + self.warmup
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                return
+            operation = rng.choices(self.operations, self.weights)[0]
+            try:
+                statuses = [response.status_code for response in self.request(session, operation, rng)]
+            except requests.RequestException:
+                statuses = [TRANSPORT_ERROR]
+            finished = time.monotonic()
+            if now >= measure_from:
+                with self.lock:
+                    self.samples[operation].append((finished - now, statuses))
+
+    def run(self):
+        started = time.monotonic()
+        stop_at = started + self.warmup + self.duration
+        clients = [threading.Thread(target=self.client, args=(index, started, stop_at), daemon=True)
+                   for index in range(self.concurrency)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        return self.samples
+
+
+def summarize(samples, duration):
+    """Throughput, latency percentiles and error/rejection rates per operation"""
+    results = {}
+    for operation, entries in sorted(samples.items()):
+        latencies = sorted(latency * 1000 for latency, _ in entries)
+        errors = sum(1 for _, statuses in entries
+                     if any(status == TRANSPORT_ERROR or (status >= 500 and status != 503) for status in statuses))
+        rejected = sum(1 for _, statuses in entries if 503 in statuses)
+        count = len(entries)
+        results[operation] = {
+            'requests': count,
+            'throughput_rps': round(count / duration, 2),
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'max_ms': round(latencies[-1], 3),
+            'error_rate': round(errors / count, 4),
+            'rejection_rate': round(rejected / count, 4),
+        }
+    return results
+
+
+def compare(results, baseline, tolerance, error_tolerance):
+    """List every metric that regressed past the tolerance against the baseline"""
+    regressions = []
+    for operation, previous in baseline['endpoints'].items():
+        current = results['endpoints'].get(operation)
+        if current is None:
+            regressions.append(f'{operation}: missing from this run')
+            continue
+        if current['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{operation}: throughput {current['throughput_rps']} rps "
+                               f"< baseline {previous['throughput_rps']} rps")
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f'{operation}: {metric} {current[metric]} > baseline {previous[metric]}')
+        for metric in ('error_rate', 'rejection_rate'):
+            if current[metric] > previous[metric] + error_tolerance:
+                regressions.append(f'{operation}: {metric} {current[metric]} > baseline {previous[metric]}')
+    return regressions
+
+
+def print_report(results):
+    print(f"\n{'operation':<10}{'requests':>10}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'errors':>9}{'503s':>9}")
+    for operation, stats in results['endpoints'].items():
+        print(f"{operation:<10}{stats['requests']:>10}{stats['throughput_rps']:>10}{stats['p50_ms']:>10}"
+              f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['error_rate']:>9.2%}{stats['rejection_rate']:>9.2%}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Start the bulkhead, write and read roles locally and load test them')
+    parser.add_argument('--rows', type=int, default=2000, help='records seeded into the write and read databases')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the data and the request mix')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('get=90,post=9,toggle=1'),
+                        help='operation weights, e.g. get=90,post=9,toggle=1')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent closed-loop clients')
+    parser.add_argument('--duration', type=float, default=20, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds of load before measuring')
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--pages', type=int, default=10, help='GETs pick a page from 1..N')
+    parser.add_argument('--server', choices=['runserver', 'gunicorn'], default='runserver')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn/uvicorn worker processes per role')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--proxy-mode', choices=['sync', 'async'], default='sync',
+                        help='async runs the bulkhead under uvicorn')
+    parser.add_argument('--replicate', action='store_true', help='also run the read node replicator')
+    parser.add_argument('--base-port', type=int, default=8100, help='bulkhead port; write and read use the next two')
+    parser.add_argument('--workdir', help='directory for databases and logs (default: a temporary one)')
+    parser.add_argument('--keep', action='store_true', help='keep the work directory afterwards')
+    parser.add_argument('--output', default='benchmark_results.json', help='where to write the JSON results')
+    parser.add_argument('--baseline', help='fail when results regress past this earlier results file')
+    parser.add_argument('--save-baseline', help='also write the results to this file as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help='allowed relative throughput drop / latency increase against the baseline')
+    parser.add_argument('--error-tolerance', type=float, default=0.01,
+                        help='allowed absolute increase in error and rejection rates')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix='bulkhead-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    cluster = Cluster(workdir, args.base_port, args.server, args.workers, args.threads,
+                      args.proxy_mode, args.replicate)
+    try:
+        cluster.prepare(args.rows, args.seed)
+        cluster.start()
+        print(f'Running {args.concurrency} clients for {args.duration}s (+{args.warmup}s warmup)...', flush=True)
+        generator = LoadGenerator(cluster.host('bulkhead'), args.mix, args.concurrency, args.duration,
+                                  args.warmup, args.seed, args.page_size, args.pages)
+        samples = generator.run()
+        bulkhead_status = requests.get(f'http://{cluster.host("bulkhead")}/bulkhead/status/', timeout=5).json()
+    finally:
+        cluster.stop()
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        'config': {key: value for key, value in vars(args).items()
+                   if key not in ('output', 'baseline', 'save_baseline', 'workdir', 'keep')},
+        'endpoints': summarize(samples, args.duration),
+        'bulkhead_status': bulkhead_status,
+    }
+    print_report(results)
+
+    with open(args.output, 'w') as output:
+        json.dump(results, output, indent=2)
+    print(f'\nResults written to {args.output}')
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as output:
+            json.dump(results, output, indent=2)
+        print(f'Baseline saved to {args.save_baseline}')
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance, args.error_tolerance)
+        if regressions:
+            print('\nRegressions against the baseline:')
+            for regression in regressions:
+                print(f'  {regression}')
+            sys.exit(1)
+        print('No regressions against the baseline')
+
+
+if __name__ == '__main__':
+    main()
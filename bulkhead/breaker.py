@@ -0,0 +1,199 @@
+# bulkhead/breaker.py
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from django.utils import timezone
+
+# Rolling window and trip thresholds shared by every upstream breaker
+BREAKER_WINDOW = float(os.environ.get('BREAKER_WINDOW', 30))
+BREAKER_MIN_REQUESTS = int(os.environ.get('BREAKER_MIN_REQUESTS', 10))
+BREAKER_ERROR_RATE = float(os.environ.get('BREAKER_ERROR_RATE', 0.5))
+BREAKER_SLOW_CALL_SECONDS = float(os.environ.get('BREAKER_SLOW_CALL_SECONDS', 5))
+BREAKER_SLOW_CALL_RATE = float(os.environ.get('BREAKER_SLOW_CALL_RATE', 0.8))
+BREAKER_OPEN_SECONDS = float(os.environ.get('BREAKER_OPEN_SECONDS', 10))
+BREAKER_HALF_OPEN_PROBES = int(os.environ.get('BREAKER_HALF_OPEN_PROBES', 3))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(Exception):
+    """Raised when a breaker refuses a call to its upstream"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f'{name} circuit is open')
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker for a single upstream.
+
+    While closed, call outcomes are kept for ``window`` seconds and the
+    breaker opens once at least ``min_requests`` calls were seen and either
+    the error rate or the slow-call rate crosses its threshold. After
+    ``open_seconds`` it lets ``half_open_probes`` calls through; if all of
+    them succeed it closes again, otherwise it reopens.
+    """
+
+    def __init__(self, name, window=BREAKER_WINDOW, min_requests=BREAKER_MIN_REQUESTS,
+                 error_rate=BREAKER_ERROR_RATE, slow_call_seconds=BREAKER_SLOW_CALL_SECONDS,
+                 slow_call_rate=BREAKER_SLOW_CALL_RATE, open_seconds=BREAKER_OPEN_SECONDS,
+                 half_open_probes=BREAKER_HALF_OPEN_PROBES):
+        self.name = name
+        self.window = window
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._lock = threading.Lock()
+        self._calls = deque()  # (monotonic time, failed, slow)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.rejected = 0
+        self.transitions = deque(maxlen=20)
+
+    def before_call(self):
+        """Admit a call or raise ``CircuitOpen``; returns True for half-open probes"""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self.open_seconds - (time.monotonic() - self._opened_at)
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpen(self.name, math.ceil(remaining))
+                self._transition(HALF_OPEN, 'open timeout elapsed')
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self.rejected += 1
+                    raise CircuitOpen(self.name, 1)
+                self._probes_in_flight += 1
+                return True
+            return False
+
+    def admits_calls(self):
+        """Whether ``before_call`` would admit a call now (without taking a probe)"""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self._opened_at >= self.open_seconds
+            if self.state == HALF_OPEN:
+                return self._probes_in_flight < self.half_open_probes
+            return True
+
+    def cancel(self, is_probe):
+        """Give back an admission that never reached the upstream"""
+        if is_probe:
+            with self._lock:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+    def after_call(self, is_probe, duration, failed):
+        """Record the outcome of an admitted call"""
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if is_probe:
+                self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+                if self.state != HALF_OPEN:
+                    return
+                if failed or slow:
+                    self._transition(OPEN, 'probe failed' if failed else 'probe too slow')
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._transition(CLOSED, 'probes succeeded')
+                return
+            if self.state != CLOSED:
+                # Outcome of a call admitted before the breaker tripped
+                return
+            now = time.monotonic()
+            self._calls.append((now, failed, slow))
+            self._prune(now)
+            total = len(self._calls)
+            if total < self.min_requests:
+                return
+            failures = sum(1 for _, call_failed, _ in self._calls if call_failed)
+            slow_calls = sum(1 for _, _, call_slow in self._calls if call_slow)
+            if failures / total >= self.error_rate:
+                self._transition(OPEN, f'error rate {failures}/{total}')
+            elif slow_calls / total >= self.slow_call_rate:
+                self._transition(OPEN, f'slow call rate {slow_calls}/{total}')
+
+    def _prune(self, now):
+        cutoff = now - self.window
+        while self._calls and self._calls[0][0] < cutoff:
+            self._calls.popleft()
+
+    def _transition(self, state, reason):
+        self.transitions.append({
+            'from': self.state,
+            'to': state,
+            'reason': reason,
+            'at': timezone.now().isoformat()
+        })
+        self.state = state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        elif state == CLOSED:
+            self._calls.clear()
+
+    def snapshot(self):
+        with self._lock:
+            self._prune(time.monotonic())
+            total = len(self._calls)
+            return {
+                'state': self.state,
+                'window_requests': total,
+                'window_failures': sum(1 for _, failed, _ in self._calls if failed),
+                'window_slow_calls': sum(1 for _, _, slow in self._calls if slow),
+                'rejected': self.rejected,
+                'transitions': list(self.transitions),
+            }
+
+
+class HostBreakers:
+    """One CircuitBreaker per host of an upstream, created on first use.
+
+    Each read replica trips on its own failures, so a failing replica is cut
+    off without opening the circuit to the healthy ones.
+    """
+
+    def __init__(self, name, **options):
+        self.name = name
+        self.options = options
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def for_host(self, host):
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(host)
+                if breaker is None:
+                    breaker = self._breakers[host] = CircuitBreaker(self.name, **self.options)
+        return breaker
+
+    def refusing_hosts(self):
+        """Hosts whose breaker would refuse a call right now"""
+        return [host for host, breaker in list(self._breakers.items()) if not breaker.admits_calls()]
+
+    def snapshot(self):
+        return {host: breaker.snapshot() for host, breaker in list(self._breakers.items())}
+
+
+# Breakers per upstream and host, next to the manual ServiceStatus toggle
+breakers = {
+    'read': HostBreakers('read'),
+    'write': HostBreakers('write'),
+}
+
+
+def breaker_stats():
+    return {name: group.snapshot() for name, group in breakers.items()}
@@ -0,0 +1,164 @@
+# bulkhead/coalesce.py
+import asyncio
+import os
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.http import HttpResponse
+
+# Share one upstream call between identical GETs that are in flight together
+BULKHEAD_COALESCE = os.environ.get('BULKHEAD_COALESCE', 'True').lower() == 'true'
+# Also reuse a finished response for this long (0 disables the micro-cache)
+BULKHEAD_MICROCACHE_SECONDS = float(os.environ.get('BULKHEAD_MICROCACHE_SECONDS', 0))
+BULKHEAD_MICROCACHE_MAX_ENTRIES = int(os.environ.get('BULKHEAD_MICROCACHE_MAX_ENTRIES', 1000))
+
+# Only successful and not-modified answers are worth reusing
+CACHEABLE_STATUSES = (200, 304)
+
+
+def coalesce_key(request, headers):
+    """Identical requests share a key: path, sorted query and the forwarded headers"""
+    query = urlencode(sorted((key, value) for key, values in request.GET.lists() for value in values))
+    return (request.path, query, tuple(sorted(headers.items())))
+
+
+class SharedResponse:
+    """Immutable copy of a relayed response that every waiter rebuilds its own from"""
+
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.content = response.content
+        self.headers = list(response.items())
+
+    def to_response(self):
+        response = HttpResponse(self.content, status=self.status_code)
+        for name, value in self.headers:
+            response[name] = value
+        return response
+
+
+class InFlight:
+    __slots__ = ('done', 'result', 'error', 'task')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.task = None
+
+
+class SingleFlight:
+    """Coalesces identical in-flight upstream calls into one.
+
+    The first caller for a key (the leader) makes the call; callers that
+    arrive before it finishes wait and receive a copy of the same response
+    or the same exception. Finished 200/304 responses can optionally be
+    served for ``microcache_seconds`` afterwards.
+    """
+
+    def __init__(self, microcache_seconds=BULKHEAD_MICROCACHE_SECONDS,
+                 microcache_max_entries=BULKHEAD_MICROCACHE_MAX_ENTRIES):
+        self.microcache_seconds = microcache_seconds
+        self.microcache_max_entries = microcache_max_entries
+        self._calls = {}
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.microcache_hits = 0
+
+    def _join(self, key):
+        """Return ``(cached, call, is_leader)`` for a new request on ``key``"""
+        with self._lock:
+            self.requests += 1
+            cached = self._cache.get(key)
+            if cached is not None:
+                if cached[0] > time.monotonic():
+                    self.microcache_hits += 1
+                    return cached[1], None, False
+                del self._cache[key]
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return None, call, False
+            call = self._calls[key] = InFlight()
+            self.upstream_calls += 1
+            return None, call, True
+
+    def _finish(self, key, call):
+        with self._lock:
+            self._calls.pop(key, None)
+            if (call.result is not None and self.microcache_seconds > 0
+                    and call.result.status_code in CACHEABLE_STATUSES):
+                self._store(key, call.result)
+        call.done.set()
+
+    def _store(self, key, result):
+        now = time.monotonic()
+        if len(self._cache) >= self.microcache_max_entries:
+            for stale in [k for k, (expires, _) in self._cache.items() if expires <= now]:
+                del self._cache[stale]
+        while len(self._cache) >= self.microcache_max_entries:
+            # Oldest insertion first
+            del self._cache[next(iter(self._cache))]
+        self._cache[key] = (now + self.microcache_seconds, result)
+
+    def do(self, key, fetch):
+        """Return a response for ``key``, calling ``fetch()`` only if nobody else is"""
+        cached, call, is_leader = self._join(key)
+        if cached is not None:
+            return cached.to_response()
+        if is_leader:
+            try:
+                call.result = SharedResponse(fetch())
+            except BaseException as e:
+                call.error = e
+            finally:
+                self._finish(key, call)
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result.to_response()
+
+    async def ado(self, key, fetch):
+        """Async ``do``; ``fetch`` is a coroutine function.
+
+        The upstream call runs as its own task, so a leader whose client
+        disconnects does not cancel it for the other waiters.
+        """
+        cached, call, is_leader = self._join(key)
+        if cached is not None:
+            return cached.to_response()
+        if is_leader:
+            async def run():
+                try:
+                    call.result = SharedResponse(await fetch())
+                except BaseException as e:
+                    call.error = e
+                finally:
+                    self._finish(key, call)
+            call.task = asyncio.ensure_future(run())
+        await asyncio.shield(call.task)
+        if call.error is not None:
+            raise call.error
+        return call.result.to_response()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': BULKHEAD_COALESCE,
+                'microcache_seconds': self.microcache_seconds,
+                'requests': self.requests,
+                'upstream_calls': self.upstream_calls,
+                'coalesced': self.coalesced,
+                'microcache_hits': self.microcache_hits,
+                'dedupe_ratio': round(1 - self.upstream_calls / self.requests, 4) if self.requests else 0.0,
+                'in_flight': len(self._calls),
+                'microcache_entries': len(self._cache),
+            }
+
+
+read_flight = SingleFlight()
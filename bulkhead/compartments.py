@@ -0,0 +1,238 @@
+# bulkhead/compartments.py
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds clients are told to wait before retrying a rejected request
+BULKHEAD_RETRY_AFTER = int(os.environ.get('BULKHEAD_RETRY_AFTER', 1))
+
+
+class CompartmentFull(Exception):
+    """Raised when a compartment has no free slot and no room to wait"""
+
+    def __init__(self, name, reason, retry_after=BULKHEAD_RETRY_AFTER):
+        super().__init__(f'{name} compartment is full ({reason})')
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Compartment:
+    """Bounded concurrency pool isolating one proxied route.
+
+    At most ``max_concurrent`` requests run at once and at most ``max_queue``
+    more wait for a slot, each for up to ``queue_timeout`` seconds. Anything
+    beyond that is rejected immediately with ``CompartmentFull``.
+
+    Given the upstream's ``AdaptiveLimiter``, a request also needs room in its
+    limit. One that could have a slot but not the limit waits at most the
+    limiter's ``queue_timeout`` and is then shed with ``LoadShed``.
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._async_waiters = []  # [future, limiter, shed_at] in arrival order
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _admit(self, limiter):
+        """Take a slot if both the compartment and ``limiter`` have room (call with the lock held)"""
+        if self.in_flight >= self.max_concurrent:
+            return False
+        if limiter is not None and not limiter.try_acquire(self.name):
+            return False
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def _limited(self, limiter):
+        """Whether only ``limiter`` keeps a request from a slot (call with the lock held)"""
+        return limiter is not None and self.in_flight < self.max_concurrent
+
+    def _refuse(self, limiter, reason):
+        """Error for a request that found no room (call with the lock held)"""
+        if self._limited(limiter):
+            # A slot was free, only the adaptive limit was in the way
+            return limiter.shed_error(self.name)
+        if reason == 'queue timeout':
+            self.timed_out += 1
+        else:
+            self.rejected += 1
+        return CompartmentFull(self.name, reason)
+
+    def acquire(self, limiter=None):
+        with self._cond:
+            if self._admit(limiter):
+                return
+            if self.waiting >= self.max_queue:
+                raise self._refuse(limiter, 'queue full')
+            if limiter is not None:
+                limiter.watch(self)
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                shed_at = None
+                while not self._admit(limiter):
+                    now = time.monotonic()
+                    if self._limited(limiter):
+                        # Waiting for the limit, not for a slot: only briefly
+                        if shed_at is None:
+                            shed_at = now + limiter.queue_timeout
+                        if now >= shed_at:
+                            raise self._refuse(limiter, 'limit timeout')
+                    else:
+                        shed_at = None
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise self._refuse(limiter, 'queue timeout')
+                    self._cond.wait(min(remaining, shed_at - now) if shed_at is not None else remaining)
+            finally:
+                self.waiting -= 1
+
+    async def acquire_async(self, limiter=None):
+        """Event-loop friendly ``acquire`` used by the async proxy mode"""
+        with self._cond:
+            if self._admit(limiter):
+                return
+            if self.waiting >= self.max_queue:
+                raise self._refuse(limiter, 'queue full')
+            if self._limited(limiter) and limiter.queue_timeout <= 0:
+                raise self._refuse(limiter, 'limit timeout')
+            if limiter is not None:
+                limiter.watch(self)
+            waiter = asyncio.get_running_loop().create_future()
+            entry = [waiter, limiter, False]
+            self._async_waiters.append(entry)
+            self.waiting += 1
+            if self._limited(limiter):
+                self._schedule_shed(entry)
+        try:
+            # release() and wake() hand a slot (and its limit) straight to a pending waiter;
+            # one kept out only by its limit for the limiter's queue_timeout gets LoadShed
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                # Handed a slot just as this waiter timed out or was cancelled: pass it on
+                self.release()
+                if limiter is not None:
+                    limiter.release()
+            if isinstance(e, asyncio.TimeoutError):
+                with self._cond:
+                    raise self._refuse(limiter, 'queue timeout')
+            raise
+        finally:
+            with self._cond:
+                self.waiting -= 1
+                if entry in self._async_waiters:
+                    self._async_waiters.remove(entry)
+        with self._cond:
+            self.admitted += 1
+
+    def _hand_off(self):
+        """Give a free slot to the first pending async waiter whose limit has room (call with the lock held).
+
+        Waiters whose limit is full keep their place until the limiter frees
+        room (it wakes us) or their ``queue_timeout`` for it runs out.
+        """
+        for entry in list(self._async_waiters):
+            waiter, limiter, shed_scheduled = entry
+            if waiter.done():
+                self._async_waiters.remove(entry)
+                continue
+            if limiter is None or limiter.try_acquire(self.name):
+                self._async_waiters.remove(entry)
+                waiter.set_result(None)
+                return True
+            # A slot is free, only the limit is in the way
+            if limiter.queue_timeout <= 0:
+                self._async_waiters.remove(entry)
+                waiter.set_exception(limiter.shed_error(self.name))
+            elif not shed_scheduled:
+                self._schedule_shed(entry)
+        return False
+
+    def _schedule_shed(self, entry):
+        """Shed ``entry`` if its limit still has no room after its queue_timeout (call with the lock held)"""
+        waiter, limiter, _ = entry
+        entry[2] = True
+        loop = waiter.get_loop()
+        loop.call_soon_threadsafe(loop.call_later, limiter.queue_timeout, self._shed_if_limited, entry)
+
+    def _shed_if_limited(self, entry):
+        with self._cond:
+            waiter, limiter, _ = entry
+            entry[2] = False
+            if waiter.done() or entry not in self._async_waiters or not self._limited(limiter):
+                # Admitted, gone, or now waiting for a compartment slot like everyone else
+                return
+            self._async_waiters.remove(entry)
+            if limiter.try_acquire(self.name):
+                self.in_flight += 1
+                waiter.set_result(None)
+            else:
+                waiter.set_exception(limiter.shed_error(self.name))
+
+    def release(self):
+        with self._cond:
+            if not self._hand_off():
+                self.in_flight -= 1
+                self._cond.notify()
+
+    def wake(self):
+        """Retry queued requests after their limiter freed a slot"""
+        with self._cond:
+            while self.in_flight < self.max_concurrent and self._hand_off():
+                self.in_flight += 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        """Hold a slot in the compartment for the duration of the block"""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self):
+        return {
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'max_concurrent': self.max_concurrent,
+            'max_queue': self.max_queue,
+            'queue_timeout': self.queue_timeout,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+        }
+
+
+def _compartment_from_env(route, max_concurrent, max_queue, queue_timeout):
+    return Compartment(
+        route,
+        max_concurrent=int(os.environ.get(f'BULKHEAD_{route}_MAX_CONCURRENT', max_concurrent)),
+        max_queue=int(os.environ.get(f'BULKHEAD_{route}_MAX_QUEUE', max_queue)),
+        queue_timeout=float(os.environ.get(f'BULKHEAD_{route}_QUEUE_TIMEOUT', queue_timeout)),
+    )
+
+
+# One compartment per proxied route so a slow upstream can't starve the other
+compartments = {
+    'GET': _compartment_from_env('GET', max_concurrent=20, max_queue=20, queue_timeout=1.0),
+    'POST': _compartment_from_env('POST', max_concurrent=10, max_queue=10, queue_timeout=1.0),
+    # Long-running exports get their own small pool so they never hold read slots
+    'EXPORT': _compartment_from_env('EXPORT', max_concurrent=2, max_queue=2, queue_timeout=1.0),
+}
+
+
+def compartment_stats():
+    return {route: compartment.snapshot() for route, compartment in compartments.items()}
@@ -0,0 +1,331 @@
+# bulkhead/hedging.py
+import asyncio
+import os
+import random
+import threading
+import time
+from bisect import insort
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+import requests
+
+from .compartments import compartments
+
+# Hedged GETs: if the first call is slower than the recent latency percentile,
+# send a second one (to another replica when there is one) and take the first answer
+BULKHEAD_HEDGE = os.environ.get('BULKHEAD_HEDGE', 'True').lower() == 'true'
+HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', 0.95))
+# Delay used until HEDGE_MIN_SAMPLES calls have been timed, and the bounds of the computed one
+HEDGE_INITIAL_DELAY = float(os.environ.get('HEDGE_INITIAL_DELAY', 0.1))
+HEDGE_MIN_DELAY = float(os.environ.get('HEDGE_MIN_DELAY', 0.005))
+HEDGE_MAX_DELAY = float(os.environ.get('HEDGE_MAX_DELAY', 2.0))
+HEDGE_MIN_SAMPLES = int(os.environ.get('HEDGE_MIN_SAMPLES', 20))
+HEDGE_WINDOW = int(os.environ.get('HEDGE_WINDOW', 500))
+# Sync mode runs GET attempts on this many threads per worker so one can be hedged;
+# by default as many as the GET compartment can run or queue, since more would be rejected
+HEDGE_MAX_THREADS = int(os.environ.get(
+    'HEDGE_MAX_THREADS', compartments['GET'].max_concurrent + compartments['GET'].max_queue))
+
+# Retries of transient failures (connection errors, 502/503/504) with full-jitter backoff
+RETRY_MAX_ATTEMPTS = int(os.environ.get('RETRY_MAX_ATTEMPTS', 3))
+RETRY_BASE_DELAY = float(os.environ.get('RETRY_BASE_DELAY', 0.05))
+RETRY_MAX_DELAY = float(os.environ.get('RETRY_MAX_DELAY', 1.0))
+# Hedges and retries together may add at most this share of extra calls (plus a small floor)
+RETRY_BUDGET_RATIO = float(os.environ.get('RETRY_BUDGET_RATIO', 0.1))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.environ.get('RETRY_BUDGET_MIN_PER_SECOND', 1.0))
+# Most extra calls that can be saved up, e.g. for a burst of failures right after startup
+RETRY_BUDGET_BURST = float(os.environ.get('RETRY_BUDGET_BURST', 10))
+
+RETRY_STATUSES = (502, 503, 504)
+
+
+class RetryBudget:
+    """Token bucket shared by every retry and hedge.
+
+    Each request deposits ``ratio`` tokens and each extra call withdraws a
+    whole one, so during an outage extra load stays near ``ratio`` of the
+    traffic instead of multiplying it. ``min_per_second`` tokens also accrue
+    over time so low-traffic workers can still retry.
+    """
+
+    def __init__(self, ratio=RETRY_BUDGET_RATIO, min_per_second=RETRY_BUDGET_MIN_PER_SECOND,
+                 burst=RETRY_BUDGET_BURST):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.withdrawn = 0
+        self.exhausted = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._refilled_at) * self.min_per_second)
+        self._refilled_at = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """Take a token for one extra call; False once the budget is spent"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens < 1:
+                self.exhausted += 1
+                return False
+            self.tokens -= 1
+            self.withdrawn += 1
+            return True
+
+    def snapshot(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                'tokens': round(self.tokens, 2),
+                'capacity': round(self.capacity, 2),
+                'ratio': self.ratio,
+                'withdrawn': self.withdrawn,
+                'exhausted': self.exhausted,
+            }
+
+
+class LatencyWindow:
+    """The last ``size`` call durations, kept sorted for percentile lookups"""
+
+    def __init__(self, size=HEDGE_WINDOW):
+        self._order = deque(maxlen=size)
+        self._sorted = []
+        self._lock = threading.Lock()
+
+    def observe(self, duration):
+        with self._lock:
+            if len(self._order) == self._order.maxlen:
+                self._sorted.remove(self._order[0])
+            self._order.append(duration)
+            insort(self._sorted, duration)
+
+    def percentile(self, fraction):
+        with self._lock:
+            if not self._sorted:
+                return None
+            index = min(len(self._sorted) - 1, int(fraction * len(self._sorted)))
+            return self._sorted[index]
+
+    def __len__(self):
+        return len(self._order)
+
+
+class Hedger:
+    """Hedged, budgeted retries of an idempotent upstream call.
+
+    ``attempt(host)`` makes one call and returns a response (anything with a
+    ``status_code``); ``choose(exclude=())`` picks the host. Only use this
+    for idempotent requests: an attempt may run twice and both may complete.
+    """
+
+    def __init__(self, budget, transient_errors, enabled=BULKHEAD_HEDGE, percentile=HEDGE_PERCENTILE,
+                 initial_delay=HEDGE_INITIAL_DELAY, min_delay=HEDGE_MIN_DELAY, max_delay=HEDGE_MAX_DELAY,
+                 min_samples=HEDGE_MIN_SAMPLES, max_attempts=RETRY_MAX_ATTEMPTS,
+                 base_delay=RETRY_BASE_DELAY, max_backoff=RETRY_MAX_DELAY, max_threads=HEDGE_MAX_THREADS):
+        self.budget = budget
+        self.transient_errors = transient_errors
+        self.enabled = enabled
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_backoff = max_backoff
+        self.max_threads = max_threads
+        self.latencies = LatencyWindow()
+        self._executor = None
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retries = 0
+
+    def hedge_delay(self):
+        """How long the first attempt may take before it is hedged"""
+        if len(self.latencies) < self.min_samples:
+            return self.initial_delay
+        return min(self.max_delay, max(self.min_delay, self.latencies.percentile(self.percentile)))
+
+    def backoff(self, retry):
+        """Full-jitter exponential backoff before retry number ``retry`` (1-based)"""
+        return random.uniform(0, min(self.max_backoff, self.base_delay * 2 ** (retry - 1)))
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _should_retry(self, response, error, attempt_number):
+        if error is not None:
+            transient = isinstance(error, self.transient_errors)
+        else:
+            transient = response.status_code in RETRY_STATUSES
+        if not transient or attempt_number >= self.max_attempts or not self.budget.withdraw():
+            return False
+        self._count('retries')
+        return True
+
+    def _timed(self, attempt, host):
+        started = time.monotonic()
+        response = attempt(host)
+        if response.status_code < 500:
+            self.latencies.observe(time.monotonic() - started)
+        return response
+
+    # Sync
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_threads, thread_name_prefix='hedge')
+        return self._executor
+
+    def _hedged(self, attempt, choose, tried):
+        host = choose(exclude=tried)
+        tried.append(host)
+        if not self.enabled:
+            return self._timed(attempt, host)
+        executor = self._get_executor()
+        primary = executor.submit(self._timed, attempt, host)
+        done, _ = wait([primary], timeout=self.hedge_delay())
+        if done or not self.budget.withdraw():
+            return primary.result()
+
+        self._count('hedges')
+        hedge_host = choose(exclude=tried)
+        tried.append(hedge_host)
+        hedge = executor.submit(self._timed, attempt, hedge_host)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count('hedge_wins')
+                    # The loser finishes in the background and its response is dropped
+                    return future.result()
+        # Both failed: report the first attempt's error
+        raise primary.exception() or hedge.exception()
+
+    def call(self, attempt, choose):
+        """Run ``attempt`` with hedging and retries and return the response"""
+        self._count('calls')
+        self.budget.deposit()
+        attempt_number = 1
+        # Retries and hedges prefer replicas that have not been tried yet
+        tried = []
+        while True:
+            response = error = None
+            try:
+                response = self._hedged(attempt, choose, tried)
+            except self.transient_errors as e:
+                error = e
+            if not self._should_retry(response, error, attempt_number):
+                break
+            time.sleep(self.backoff(attempt_number))
+            attempt_number += 1
+        if error is not None:
+            raise error
+        return response
+
+    # Async
+
+    async def _ahedged(self, attempt, choose, tried):
+        async def timed(host):
+            started = time.monotonic()
+            response = await attempt(host)
+            if response.status_code < 500:
+                self.latencies.observe(time.monotonic() - started)
+            return response
+
+        host = choose(exclude=tried)
+        tried.append(host)
+        if not self.enabled:
+            return await timed(host)
+        primary = asyncio.ensure_future(timed(host))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay())
+            if done or not self.budget.withdraw():
+                return await primary
+
+            self._count('hedges')
+            hedge_host = choose(exclude=tried)
+            tried.append(hedge_host)
+            hedge = asyncio.ensure_future(timed(hedge_host))
+            pending.add(hedge)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count('hedge_wins')
+                        return task.result()
+            raise primary.exception() or hedge.exception()
+        finally:
+            # Cancelling the loser makes aforward_request give back its breaker,
+            # limit and compartment admissions, whether it was queued or in flight
+            for task in pending:
+                task.cancel()
+
+    async def acall(self, attempt, choose):
+        """Async ``call``; ``attempt`` is a coroutine function"""
+        self._count('calls')
+        self.budget.deposit()
+        attempt_number = 1
+        # Retries and hedges prefer replicas that have not been tried yet
+        tried = []
+        while True:
+            response = error = None
+            try:
+                response = await self._ahedged(attempt, choose, tried)
+            except self.transient_errors as e:
+                error = e
+            if not self._should_retry(response, error, attempt_number):
+                break
+            await asyncio.sleep(self.backoff(attempt_number))
+            attempt_number += 1
+        if error is not None:
+            raise error
+        return response
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                'enabled': self.enabled,
+                'calls': self.calls,
+                'hedges': self.hedges,
+                'hedge_wins': self.hedge_wins,
+                'retries': self.retries,
+            }
+        delay = self.hedge_delay()
+        stats['hedge_delay_ms'] = round(delay * 1000, 3)
+        stats['latency_samples'] = len(self.latencies)
+        return stats
+
+
+retry_budget = RetryBudget()
+
+# Errors worth retrying: the request never reached the upstream, or the connection dropped
+read_hedger = Hedger(retry_budget, requests.ConnectionError)
+async_read_hedger = Hedger(retry_budget, (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError))
+
+
+def _reset_after_fork():
+    # Executor threads do not survive a fork; the child starts its own
+    read_hedger._executor = None
+    read_hedger._lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,217 @@
+# bulkhead/limiter.py
+import math
+import os
+import statistics
+import threading
+import time
+
+from .compartments import BULKHEAD_RETRY_AFTER
+
+# AIMD concurrency limit per upstream, adapted from observed latency and errors
+LIMITER_ENABLED = os.environ.get('LIMITER_ENABLED', 'True').lower() == 'true'
+LIMITER_INITIAL_LIMIT = float(os.environ.get('LIMITER_INITIAL_LIMIT', 20))
+LIMITER_MIN_LIMIT = float(os.environ.get('LIMITER_MIN_LIMIT', 2))
+LIMITER_MAX_LIMIT = float(os.environ.get('LIMITER_MAX_LIMIT', 200))
+# Multiplicative decrease applied when a call fails or a sample of calls is slow,
+# at most once per cooldown so one burst of failures only cuts the limit once
+LIMITER_BACKOFF = float(os.environ.get('LIMITER_BACKOFF', 0.9))
+LIMITER_DECREASE_COOLDOWN = float(os.environ.get('LIMITER_DECREASE_COOLDOWN', 1.0))
+# A sample is slow once its median latency is this many times the long-run median (and above the floor)
+LIMITER_LATENCY_TOLERANCE = float(os.environ.get('LIMITER_LATENCY_TOLERANCE', 2.0))
+LIMITER_LATENCY_FLOOR = float(os.environ.get('LIMITER_LATENCY_FLOOR', 0.25))
+# Calls per sample, and how far each sample median moves the long-run median
+LIMITER_SAMPLE_SIZE = int(os.environ.get('LIMITER_SAMPLE_SIZE', 50))
+LIMITER_BASELINE_SMOOTHING = float(os.environ.get('LIMITER_BASELINE_SMOOTHING', 0.05))
+# Seconds a request with a free compartment slot waits for room in the limit before it is shed
+LIMITER_QUEUE_TIMEOUT = float(os.environ.get('LIMITER_QUEUE_TIMEOUT', 0.05))
+# Routes that may use the whole limit; others (exports by default) leave LIMITER_PRIORITY_RESERVE
+# of it free for them. Reads and writes have separate upstreams, so writes never wait on reads
+LIMITER_PRIORITY_ROUTES = [route.strip().upper() for route in
+                           os.environ.get('LIMITER_PRIORITY_ROUTES', 'POST,GET').split(',') if route.strip()]
+LIMITER_PRIORITY_RESERVE = float(os.environ.get('LIMITER_PRIORITY_RESERVE', 0.2))
+# Seconds after the last priority call during which the reserve is kept free
+LIMITER_PRIORITY_WINDOW = float(os.environ.get('LIMITER_PRIORITY_WINDOW', 30))
+
+
+class LoadShed(Exception):
+    """Raised when a request had a compartment slot but the adaptive limit had no room for it"""
+
+    def __init__(self, name, route, retry_after=BULKHEAD_RETRY_AFTER):
+        super().__init__(f'{name} upstream is at its concurrency limit, {route} request shed')
+        self.name = name
+        self.route = route
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """AIMD limit on concurrent calls to one upstream.
+
+    Every successful call while the limit is in use raises it by ``1 / limit``
+    (about +1 per limit's worth of calls). A failed call cuts it by
+    ``backoff``, and so does a sample of ``sample_size`` calls whose median is
+    slower than ``latency_tolerance`` times the long-run median and
+    ``latency_floor``; either cut happens at most once per
+    ``decrease_cooldown`` seconds. Comparing medians keeps ordinary queueing
+    jitter under load from counting as overload.
+
+    The route's compartment asks for room (see ``Compartment.acquire``). A
+    request that has a compartment slot but no room in the limit waits at most
+    ``queue_timeout`` seconds and is then shed. While priority routes are
+    active, other routes may only use ``1 - priority_reserve`` of the limit.
+    """
+
+    def __init__(self, name, initial_limit=LIMITER_INITIAL_LIMIT, min_limit=LIMITER_MIN_LIMIT,
+                 max_limit=LIMITER_MAX_LIMIT, backoff=LIMITER_BACKOFF,
+                 decrease_cooldown=LIMITER_DECREASE_COOLDOWN, queue_timeout=LIMITER_QUEUE_TIMEOUT,
+                 latency_tolerance=LIMITER_LATENCY_TOLERANCE, latency_floor=LIMITER_LATENCY_FLOOR,
+                 sample_size=LIMITER_SAMPLE_SIZE, baseline_smoothing=LIMITER_BASELINE_SMOOTHING,
+                 priority_routes=LIMITER_PRIORITY_ROUTES, priority_reserve=LIMITER_PRIORITY_RESERVE,
+                 priority_window=LIMITER_PRIORITY_WINDOW, enabled=LIMITER_ENABLED):
+        self.name = name
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.decrease_cooldown = decrease_cooldown
+        self.queue_timeout = queue_timeout
+        self.latency_tolerance = latency_tolerance
+        self.latency_floor = latency_floor
+        self.sample_size = max(1, sample_size)
+        self.baseline_smoothing = baseline_smoothing
+        self.priority_routes = set(priority_routes)
+        self.priority_reserve = priority_reserve
+        self.priority_window = priority_window
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # Compartments with calls queued behind this limit, woken whenever a slot frees
+        self._watchers = set()
+        self.in_flight = 0
+        self._sample = []
+        self._baseline = None
+        self._last_decrease_at = -math.inf
+        self._last_priority_at = -math.inf
+        self.admitted = 0
+        self.shed = {}
+        self.increases = 0
+        self.decreases = 0
+
+    def try_acquire(self, route):
+        """Take a slot for ``route`` if the limit has room; never blocks"""
+        with self._lock:
+            now = time.monotonic()
+            if route in self.priority_routes:
+                self._last_priority_at = now
+                cap = self.limit
+            elif now - self._last_priority_at < self.priority_window:
+                cap = self.limit * (1 - self.priority_reserve)
+            else:
+                cap = self.limit
+            if self.enabled and self.in_flight >= max(math.floor(cap), 1):
+                return False
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+    def shed_error(self, route):
+        """Count a request refused for lack of room in the limit and return its ``LoadShed``"""
+        with self._lock:
+            self.shed[route] = self.shed.get(route, 0) + 1
+        return LoadShed(self.name, route)
+
+    def watch(self, compartment):
+        self._watchers.add(compartment)
+
+    def release(self, duration=None, failed=False):
+        """Free a slot; pass the call's outcome to adapt the limit (none for cancelled calls)"""
+        with self._lock:
+            in_use = self.in_flight
+            self.in_flight -= 1
+            if duration is not None:
+                self._adapt(in_use, duration, failed, time.monotonic())
+        # Outside the lock: compartments take their own lock and then call try_acquire
+        for compartment in list(self._watchers):
+            compartment.wake()
+
+    def _adapt(self, in_use, duration, failed, now):
+        if failed:
+            self._decrease(now)
+            return
+        if in_use >= self.limit / 2:
+            # Only grow while the limit is actually being used
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.increases += 1
+        self._sample.append(duration)
+        if len(self._sample) < self.sample_size:
+            return
+        median = statistics.median(self._sample)
+        self._sample = []
+        if self._baseline is None:
+            self._baseline = median
+            return
+        if median > self.threshold():
+            self._decrease(now)
+        self._baseline += self.baseline_smoothing * (median - self._baseline)
+
+    def _decrease(self, now):
+        if now - self._last_decrease_at < self.decrease_cooldown:
+            return
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self._last_decrease_at = now
+        self.decreases += 1
+
+    def threshold(self):
+        """Median latency above which a sample of calls counts as slow"""
+        if self._baseline is None:
+            return self.latency_floor
+        return max(self._baseline * self.latency_tolerance, self.latency_floor)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'baseline_latency_ms': round(self._baseline * 1000, 3) if self._baseline is not None else None,
+                'slow_threshold_ms': round(self.threshold() * 1000, 3),
+                'priority_routes': sorted(self.priority_routes),
+                'admitted': self.admitted,
+                'shed': dict(self.shed),
+                'increases': self.increases,
+                'decreases': self.decreases,
+            }
+
+
+class HostLimiters:
+    """One AdaptiveLimiter per host of an upstream, created on first use.
+
+    Each read replica's limit follows its own latency and errors, so a slow
+    replica does not shrink the limit of the others.
+    """
+
+    def __init__(self, name, **options):
+        self.name = name
+        self.options = options
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def for_host(self, host):
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(host)
+                if limiter is None:
+                    limiter = self._limiters[host] = AdaptiveLimiter(self.name, **self.options)
+        return limiter
+
+    def snapshot(self):
+        return {host: limiter.snapshot() for host, limiter in list(self._limiters.items())}
+
+
+limiters = {
+    'read': HostLimiters('read'),
+    'write': HostLimiters('write'),
+}
+
+
+def limiter_stats():
+    return {name: group.snapshot() for name, group in limiters.items()}
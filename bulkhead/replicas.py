@@ -0,0 +1,186 @@
+# bulkhead/replicas.py
+import os
+import random
+import threading
+import time
+
+import requests
+
+from .upstream import get_pool
+
+# Comma-separated read servers; READ_DB_IP alone still works for a single one
+READ_DB_IPS = [host.strip() for host in
+               os.environ.get('READ_DB_IPS', os.environ.get('READ_DB_IP', 'localhost:8002')).split(',')
+               if host.strip()]
+# 'ewma' (latency x load) or 'least_outstanding'
+REPLICA_BALANCER = os.environ.get('REPLICA_BALANCER', 'ewma').lower()
+REPLICA_EWMA_ALPHA = float(os.environ.get('REPLICA_EWMA_ALPHA', 0.3))
+REPLICA_HEALTH_INTERVAL = float(os.environ.get('REPLICA_HEALTH_INTERVAL', 2.0))
+REPLICA_HEALTH_TIMEOUT = float(os.environ.get('REPLICA_HEALTH_TIMEOUT', 1.0))
+# Consecutive failures that take a replica out, and passed checks that bring it back
+REPLICA_UNHEALTHY_THRESHOLD = int(os.environ.get('REPLICA_UNHEALTHY_THRESHOLD', 2))
+REPLICA_HEALTHY_THRESHOLD = int(os.environ.get('REPLICA_HEALTHY_THRESHOLD', 2))
+
+HEALTH_CHECK_PATH = '/database/health/'
+
+
+class Replica:
+    """Load, latency and health of one read server as seen by this worker"""
+
+    def __init__(self, host):
+        self.host = host
+        self.healthy = True
+        self.outstanding = 0
+        self.ewma = None
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.consecutive_successes = 0
+        self.ejections = 0
+        self.last_check_at = None
+        self.last_error = None
+
+    def snapshot(self):
+        return {
+            'host': self.host,
+            'healthy': self.healthy,
+            'outstanding': self.outstanding,
+            'ewma_latency_ms': round(self.ewma * 1000, 3) if self.ewma is not None else None,
+            'requests': self.requests,
+            'failures': self.failures,
+            'ejections': self.ejections,
+            'last_check_age': round(time.monotonic() - self.last_check_at, 3) if self.last_check_at else None,
+            'last_error': self.last_error,
+        }
+
+
+class ReplicaSet:
+    """Picks a read server per request and keeps unhealthy ones out of rotation.
+
+    A background thread polls every replica's health endpoint. Replicas are
+    ejected after ``unhealthy_threshold`` consecutive failed checks or
+    failed requests, and rejoin after ``healthy_threshold`` passed checks.
+    If every replica is ejected, all of them are tried rather than none.
+    """
+
+    def __init__(self, hosts, balancer=REPLICA_BALANCER, alpha=REPLICA_EWMA_ALPHA,
+                 health_interval=REPLICA_HEALTH_INTERVAL, health_timeout=REPLICA_HEALTH_TIMEOUT,
+                 unhealthy_threshold=REPLICA_UNHEALTHY_THRESHOLD, healthy_threshold=REPLICA_HEALTHY_THRESHOLD):
+        self.replicas = {host: Replica(host) for host in hosts}
+        self.balancer = balancer
+        self.alpha = alpha
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.unhealthy_threshold = unhealthy_threshold
+        self.healthy_threshold = healthy_threshold
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def choose(self, exclude=()):
+        """Host of the replica expected to answer soonest, avoiding ``exclude`` when possible"""
+        self._ensure_checker()
+        with self._lock:
+            candidates = [replica for replica in self.replicas.values() if replica.healthy]
+            candidates = candidates or list(self.replicas.values())
+            candidates = [replica for replica in candidates if replica.host not in exclude] or candidates
+            random.shuffle(candidates)
+            if self.balancer == 'least_outstanding':
+                return min(candidates, key=lambda replica: replica.outstanding).host
+            # Replicas without a sample yet are assumed as fast as the fastest known one
+            known = [replica.ewma for replica in candidates if replica.ewma is not None]
+            default = min(known) if known else 0.0
+            return min(candidates, key=lambda replica: (
+                (replica.ewma if replica.ewma is not None else default) * (replica.outstanding + 1),
+                replica.outstanding)).host
+
+    def begin(self, host):
+        """Count a request sent to ``host``; hosts outside the set are ignored"""
+        replica = self.replicas.get(host)
+        if replica is not None:
+            with self._lock:
+                replica.outstanding += 1
+
+    def cancel(self, host):
+        """Forget a request that was abandoned before it completed"""
+        replica = self.replicas.get(host)
+        if replica is not None:
+            with self._lock:
+                replica.outstanding -= 1
+
+    def end(self, host, duration, failed):
+        replica = self.replicas.get(host)
+        if replica is None:
+            return
+        with self._lock:
+            replica.outstanding -= 1
+            replica.requests += 1
+            if failed:
+                replica.failures += 1
+                self._record_failure(replica, 'request failed')
+                return
+            replica.consecutive_failures = 0
+            if replica.ewma is None:
+                replica.ewma = duration
+            else:
+                replica.ewma += self.alpha * (duration - replica.ewma)
+
+    def _record_failure(self, replica, error):
+        replica.consecutive_failures += 1
+        replica.consecutive_successes = 0
+        replica.last_error = error
+        if replica.healthy and replica.consecutive_failures >= self.unhealthy_threshold:
+            replica.healthy = False
+            replica.ejections += 1
+
+    def _record_success(self, replica):
+        replica.consecutive_failures = 0
+        replica.consecutive_successes += 1
+        if not replica.healthy and replica.consecutive_successes >= self.healthy_threshold:
+            replica.healthy = True
+            # Relearn its latency instead of trusting the one from before the outage
+            replica.ewma = None
+
+    def check(self, replica):
+        """Run one active health check against ``replica``"""
+        try:
+            response = get_pool(replica.host).request('GET', HEALTH_CHECK_PATH, timeout=self.health_timeout)
+            error = None
+            if response.status_code != 200:
+                error = f'health check returned {response.status_code}'
+            elif response.json().get('server_type') not in ('read', 'both'):
+                error = 'not a read server'
+        except (requests.RequestException, ValueError) as e:
+            error = str(e)
+        with self._lock:
+            replica.last_check_at = time.monotonic()
+            if error is None:
+                replica.last_error = None
+                self._record_success(replica)
+            else:
+                self._record_failure(replica, error)
+
+    def _ensure_checker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            # A thread started before a fork does not exist in the child
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run_checks, name='replica-health', daemon=True)
+                self._thread.start()
+
+    def _run_checks(self):
+        while True:
+            for replica in list(self.replicas.values()):
+                self.check(replica)
+            time.sleep(self.health_interval)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'balancer': self.balancer,
+                'healthy': sum(replica.healthy for replica in self.replicas.values()),
+                'replicas': [replica.snapshot() for replica in self.replicas.values()],
+            }
+
+
+read_replicas = ReplicaSet(READ_DB_IPS)
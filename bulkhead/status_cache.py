@@ -0,0 +1,105 @@
+# bulkhead/status_cache.py
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .models import ServiceStatus
+
+# How long (seconds) a worker trusts its cached flags before revalidating
+SERVICE_STATUS_TTL = float(os.environ.get('SERVICE_STATUS_TTL', 1.0))
+# File shared by all workers on the host; toggles bump the generation stored in it
+SERVICE_STATUS_GENERATION_FILE = os.environ.get(
+    'SERVICE_STATUS_GENERATION_FILE',
+    str(settings.BASE_DIR / 'bulkhead_status.generation')
+)
+
+SERVICES = ('GET', 'POST')
+
+
+class ServiceStatusCache:
+    """In-process cache of the GET/POST toggles.
+
+    Flag checks are served from memory. Once the TTL expires the worker reads
+    the shared generation file and only queries the database when another
+    worker has toggled a service since the last load, so a toggle is visible
+    everywhere within ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl=SERVICE_STATUS_TTL, generation_file=SERVICE_STATUS_GENERATION_FILE):
+        self.ttl = ttl
+        self.generation_file = generation_file
+        self._lock = threading.Lock()
+        self._flags = None
+        self._generation = None
+        self._checked_at = 0.0
+
+    def is_enabled(self, service_name):
+        """Return whether a service is enabled, revalidating after the TTL"""
+        flags = self._flags
+        if flags is None or time.monotonic() - self._checked_at >= self.ttl:
+            flags = self._revalidate()
+        return flags.get(service_name, True)
+
+    def peek(self, service_name):
+        """Return the cached flag, or None when it must be revalidated first"""
+        flags = self._flags
+        if flags is None or time.monotonic() - self._checked_at >= self.ttl:
+            return None
+        return flags.get(service_name, True)
+
+    def _revalidate(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._flags is not None and now - self._checked_at < self.ttl:
+                return self._flags
+            generation = self.read_generation()
+            if self._flags is None or generation != self._generation:
+                self._flags = self._load_flags()
+                self._generation = generation
+            self._checked_at = now
+            return self._flags
+
+    def _load_flags(self):
+        flags = dict(ServiceStatus.objects.filter(service_name__in=SERVICES)
+                     .values_list('service_name', 'is_enabled'))
+        for service_name in SERVICES:
+            if service_name not in flags:
+                # Create default enabled status if doesn't exist
+                status, _ = ServiceStatus.objects.get_or_create(
+                    service_name=service_name,
+                    defaults={'is_enabled': True}
+                )
+                flags[service_name] = status.is_enabled
+        return flags
+
+    def read_generation(self):
+        try:
+            with open(self.generation_file) as generation_file:
+                return int(generation_file.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def bump_generation(self):
+        """Publish a new generation so every worker reloads its flags"""
+        generation = max(self.read_generation() + 1, time.time_ns())
+        tmp_path = f'{self.generation_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as generation_file:
+            generation_file.write(str(generation))
+        os.replace(tmp_path, self.generation_file)
+        return generation
+
+    def invalidate(self):
+        """Notify every worker of a toggle and reload on the next check here"""
+        generation = self.bump_generation()
+        with self._lock:
+            self._flags = None
+        return generation
+
+    @property
+    def generation(self):
+        return self._generation
+
+
+status_cache = ServiceStatusCache()
@@ -1,3 +1,578 @@
-from django.test import TestCase
+import asyncio
+import http.server
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.test import RequestFactory, SimpleTestCase
+
+from . import views
+from .breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, HostBreakers, breaker_stats
+from .compartments import Compartment, CompartmentFull
+from .hedging import Hedger, RetryBudget
+from .limiter import AdaptiveLimiter, HostLimiters, LoadShed, limiter_stats
+from .replicas import ReplicaSet
+from .upstream import AsyncUpstreamPool
+
+
+async def until(condition):
+    """Yield to the event loop until ``condition()`` holds"""
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0)
+    raise AssertionError('condition never became true')
+
+
+class CompartmentQueueTests(SimpleTestCase):
+    def test_queued_request_gets_the_released_slot(self):
+        compartment = Compartment('GET', max_concurrent=1, max_queue=1, queue_timeout=5)
+        compartment.acquire()
+        queued = threading.Thread(target=compartment.acquire)
+        queued.start()
+        for _ in range(100):
+            if compartment.waiting:
+                break
+            queued.join(0.01)
+        self.assertEqual(compartment.waiting, 1)
+
+        compartment.release()
+        queued.join(5)
+        self.assertFalse(queued.is_alive())
+        self.assertEqual((compartment.in_flight, compartment.waiting, compartment.admitted), (1, 0, 2))
+
+    def test_rejects_when_the_queue_is_full_or_the_wait_times_out(self):
+        compartment = Compartment('GET', max_concurrent=1, max_queue=0, queue_timeout=5)
+        compartment.acquire()
+        with self.assertRaisesMessage(CompartmentFull, 'queue full'):
+            compartment.acquire()
+
+        compartment = Compartment('GET', max_concurrent=1, max_queue=1, queue_timeout=0.01)
+        compartment.acquire()
+        with self.assertRaisesMessage(CompartmentFull, 'queue timeout'):
+            compartment.acquire()
+        self.assertEqual((compartment.in_flight, compartment.waiting, compartment.timed_out), (1, 0, 1))
+
+    async def test_release_hands_the_slot_to_async_waiters_in_order(self):
+        compartment = Compartment('GET', max_concurrent=1, max_queue=2, queue_timeout=5)
+        await compartment.acquire_async()
+        first = asyncio.ensure_future(compartment.acquire_async())
+        await until(lambda: compartment.waiting == 1)
+        second = asyncio.ensure_future(compartment.acquire_async())
+        await until(lambda: compartment.waiting == 2)
+
+        compartment.release()
+        await asyncio.wait_for(first, 1)
+        self.assertFalse(second.done())
+        # The slot changed hands without ever being free
+        self.assertEqual((compartment.in_flight, compartment.waiting), (1, 1))
+
+        compartment.release()
+        await asyncio.wait_for(second, 1)
+        compartment.release()
+        self.assertEqual((compartment.in_flight, compartment.waiting, compartment.admitted), (0, 0, 3))
+
+    async def test_async_waiter_times_out(self):
+        compartment = Compartment('GET', max_concurrent=1, max_queue=1, queue_timeout=0.01)
+        await compartment.acquire_async()
+        with self.assertRaisesMessage(CompartmentFull, 'queue timeout'):
+            await compartment.acquire_async()
+        compartment.release()
+        self.assertEqual((compartment.in_flight, compartment.waiting, compartment.timed_out), (0, 0, 1))
+
+
+class BreakerProbeTests(SimpleTestCase):
+    def half_open_breaker(self, probes=2):
+        breaker = CircuitBreaker('test', min_requests=1, open_seconds=0, half_open_probes=probes)
+        breaker.after_call(False, 0.01, failed=True)
+        self.assertEqual(breaker.state, OPEN)
+        return breaker
+
+    def test_only_the_configured_number_of_probes_is_admitted(self):
+        breaker = self.half_open_breaker(probes=2)
+        self.assertTrue(breaker.before_call())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertTrue(breaker.before_call())
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+
+    def test_cancelled_probe_is_given_back(self):
+        breaker = self.half_open_breaker(probes=1)
+        is_probe = breaker.before_call()
+        breaker.cancel(is_probe)
+        self.assertTrue(breaker.before_call())
+
+    def test_probes_close_or_reopen_the_breaker(self):
+        breaker = self.half_open_breaker(probes=2)
+        for is_probe in [breaker.before_call(), breaker.before_call()]:
+            breaker.after_call(is_probe, 0.01, failed=False)
+        self.assertEqual(breaker.state, CLOSED)
+
+        breaker = self.half_open_breaker(probes=2)
+        breaker.after_call(breaker.before_call(), 0.01, failed=True)
+        self.assertEqual(breaker.state, OPEN)
+
+
+class CancelledAttemptTests(SimpleTestCase):
+    """A hedge cancelled by Hedger.acall must give back everything it was admitted with"""
+
+    def setUp(self):
+        self.compartment = Compartment('GET', max_concurrent=1, max_queue=5, queue_timeout=5)
+        read_limiters = HostLimiters('read')
+        read_breakers = HostBreakers('read', min_requests=1, open_seconds=0, half_open_probes=1)
+        self.limiter = read_limiters.for_host('replica:1')
+        self.breaker = read_breakers.for_host('replica:1')
+        for target, value in [(views.compartments, {'GET': self.compartment}),
+                              (views.limiters, {'read': read_limiters}),
+                              (views.breakers, {'read': read_breakers})]:
+            patcher = mock.patch.dict(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_cancel_while_queued_releases_limit_and_probe(self):
+        # Trip the breaker so the attempt is its only half-open probe
+        self.breaker.after_call(False, 0.01, failed=True)
+        self.compartment.acquire()
+        attempt = asyncio.ensure_future(views.aforward_request('GET', 'read', 'replica:1', 'GET', '/'))
+        await until(lambda: self.compartment.waiting == 1)
+
+        attempt.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await attempt
+        self.assertEqual(self.limiter.in_flight, 0)
+        self.assertEqual(self.compartment.waiting, 0)
+        self.assertTrue(self.breaker.before_call())
+
+    async def test_slot_handed_to_a_cancelled_waiter_is_passed_on(self):
+        self.compartment.acquire()
+        waiter = asyncio.ensure_future(self.compartment.acquire_async())
+        await until(lambda: self.compartment.waiting == 1)
+
+        # The slot is handed over and the waiter cancelled before it runs again
+        self.compartment.release()
+        waiter.cancel()
+        try:
+            await waiter
+            # wait_for may still return the slot it was handed; then the caller holds it
+            self.compartment.release()
+        except asyncio.CancelledError:
+            pass
+        self.assertEqual(self.compartment.in_flight, 0)
+        self.assertEqual(self.compartment.waiting, 0)
+
+
+class AdaptiveLimiterTests(SimpleTestCase):
+    def limiter(self, **kwargs):
+        options = dict(initial_limit=1, min_limit=1, sample_size=10, latency_floor=0.05, queue_timeout=5,
+                       decrease_cooldown=0, enabled=True)
+        options.update(kwargs)
+        return AdaptiveLimiter('read', **options)
+
+    def test_requests_over_the_limit_wait_for_it_briefly(self):
+        limiter = self.limiter()
+        compartment = Compartment('GET', max_concurrent=5, max_queue=5, queue_timeout=5)
+        compartment.acquire(limiter)
+        queued = threading.Thread(target=compartment.acquire, args=(limiter,))
+        queued.start()
+        for _ in range(100):
+            if compartment.waiting:
+                break
+            queued.join(0.01)
+        self.assertEqual(compartment.waiting, 1)
+
+        compartment.release()
+        limiter.release(0.01)
+        queued.join(5)
+        self.assertFalse(queued.is_alive())
+        self.assertEqual((compartment.in_flight, limiter.in_flight), (1, 1))
+        self.assertEqual(limiter.shed, {})
+
+    def test_shed_after_the_limiter_queue_timeout_not_the_compartment_one(self):
+        limiter = self.limiter(queue_timeout=0.01)
+        compartment = Compartment('GET', max_concurrent=5, max_queue=5, queue_timeout=30)
+        compartment.acquire(limiter)
+        with self.assertRaises(LoadShed):
+            compartment.acquire(limiter)
+
+        limiter.queue_timeout = 0
+        with self.assertRaises(LoadShed):
+            compartment.acquire(limiter)
+        self.assertEqual(limiter.shed, {'GET': 2})
+        self.assertEqual((compartment.in_flight, compartment.waiting, limiter.in_flight), (1, 0, 1))
+
+    async def test_async_waiter_is_shed_after_the_limiter_queue_timeout(self):
+        limiter = self.limiter(queue_timeout=0.01)
+        compartment = Compartment('GET', max_concurrent=5, max_queue=5, queue_timeout=30)
+        await compartment.acquire_async(limiter)
+        with self.assertRaises(LoadShed):
+            await asyncio.wait_for(compartment.acquire_async(limiter), 1)
+
+        limiter.queue_timeout = 0
+        with self.assertRaises(LoadShed):
+            await compartment.acquire_async(limiter)
+        self.assertEqual(limiter.shed, {'GET': 2})
+        self.assertEqual((compartment.in_flight, compartment.waiting, limiter.in_flight), (1, 0, 1))
+
+    async def test_queued_waiter_is_shed_once_only_the_limit_holds_it(self):
+        limiter = self.limiter(initial_limit=2, queue_timeout=0.01)
+        compartment = Compartment('GET', max_concurrent=1, max_queue=5, queue_timeout=30)
+        await compartment.acquire_async(limiter)
+        self.assertTrue(limiter.try_acquire('POST'))
+        waiter = asyncio.ensure_future(compartment.acquire_async(limiter))
+        await until(lambda: compartment.waiting == 1)
+
+        # The compartment slot frees up while the limit stays in use
+        compartment.release()
+        self.assertEqual(compartment.waiting, 1)
+        with self.assertRaises(LoadShed):
+            await asyncio.wait_for(waiter, 1)
+        self.assertEqual((compartment.in_flight, compartment.waiting), (0, 0))
+
+    def test_full_compartment_is_not_reported_as_shed(self):
+        limiter = self.limiter(initial_limit=10)
+        compartment = Compartment('GET', max_concurrent=1, max_queue=0, queue_timeout=5)
+        compartment.acquire(limiter)
+        with self.assertRaises(CompartmentFull):
+            compartment.acquire(limiter)
+        self.assertEqual(limiter.shed, {})
+
+    def test_latency_jitter_does_not_shrink_the_limit(self):
+        limiter = self.limiter(initial_limit=20)
+        for index in range(500):
+            limiter.try_acquire('GET')
+            # Between 20 and 180 ms, as under ordinary queueing
+            limiter.release(0.02 + (index * 37 % 9) * 0.02)
+        self.assertEqual(limiter.decreases, 0)
+
+    def test_slow_sample_or_failure_shrinks_the_limit(self):
+        limiter = self.limiter(initial_limit=20)
+        for duration in [0.1] * 20 + [0.5] * 10:
+            limiter.try_acquire('GET')
+            limiter.release(duration)
+        self.assertEqual(limiter.decreases, 1)
+
+        limiter = self.limiter(initial_limit=20)
+        limiter.try_acquire('GET')
+        limiter.release(0.01, failed=True)
+        self.assertEqual(limiter.limit, 18)
+
+    def test_decreases_are_spaced_by_the_cooldown(self):
+        limiter = self.limiter(initial_limit=20, decrease_cooldown=30)
+        for _ in range(5):
+            limiter.try_acquire('GET')
+            limiter.release(0.01, failed=True)
+        self.assertEqual((limiter.limit, limiter.decreases), (18, 1))
+
+        limiter._last_decrease_at -= 30
+        limiter.try_acquire('GET')
+        limiter.release(0.01, failed=True)
+        self.assertEqual(limiter.decreases, 2)
+
+    async def test_cancelled_waiter_holds_no_limit(self):
+        limiter = self.limiter()
+        compartment = Compartment('GET', max_concurrent=5, max_queue=5, queue_timeout=5)
+        await compartment.acquire_async(limiter)
+        waiter = asyncio.ensure_future(compartment.acquire_async(limiter))
+        await until(lambda: compartment.waiting == 1)
+
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        self.assertEqual((compartment.in_flight, compartment.waiting, limiter.in_flight), (1, 0, 1))
+
+    async def test_limit_handed_to_a_cancelled_waiter_is_passed_on(self):
+        limiter = self.limiter()
+        compartment = Compartment('GET', max_concurrent=5, max_queue=5, queue_timeout=5)
+        await compartment.acquire_async(limiter)
+        cancelled = asyncio.ensure_future(compartment.acquire_async(limiter))
+        await until(lambda: compartment.waiting == 1)
+        following = asyncio.ensure_future(compartment.acquire_async(limiter))
+        await until(lambda: compartment.waiting == 2)
+
+        # The freed limit goes to the first waiter, which is cancelled before it runs again
+        compartment.release()
+        limiter.release(0.01)
+        cancelled.cancel()
+        try:
+            await cancelled
+            compartment.release()
+            limiter.release()
+        except asyncio.CancelledError:
+            pass
+        await asyncio.wait_for(following, 1)
+        self.assertEqual((compartment.in_flight, compartment.waiting, limiter.in_flight), (1, 0, 1))
+
+
+class PerReplicaTests(SimpleTestCase):
+    """Each read replica trips its own breaker and adapts its own limit"""
+
+    def setUp(self):
+        # Never ejected by failures here, so only the breakers keep a replica out
+        self.replicas = ReplicaSet(['a:1', 'b:1'], unhealthy_threshold=100)
+        self.breakers = HostBreakers('read', min_requests=2, open_seconds=30)
+        self.limiters = HostLimiters('read', decrease_cooldown=0)
+        for patcher in [mock.patch.object(self.replicas, '_ensure_checker'),
+                        mock.patch.object(views, 'read_replicas', self.replicas),
+                        mock.patch.dict(views.breakers, {'read': self.breakers}),
+                        mock.patch.dict(views.limiters, {'read': self.limiters})]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        views.track_upstream_hosts()
+
+    def fail(self, host, times):
+        for _ in range(times):
+            self.limiters.for_host(host).try_acquire('GET')
+            views.begin_call('read', host)
+            views.finish_call('read', 'GET', host, False, time.monotonic(), 503)
+
+    def test_failing_replica_is_cut_off_alone(self):
+        self.fail('a:1', 2)
+
+        self.assertEqual(self.breakers.for_host('a:1').state, OPEN)
+        self.assertEqual(self.breakers.for_host('b:1').state, CLOSED)
+        self.assertLess(self.limiters.for_host('a:1').limit, self.limiters.for_host('b:1').limit)
+        self.assertEqual({views.choose_replica() for _ in range(20)}, {'b:1'})
+
+    def test_every_breaker_open_still_picks_a_replica(self):
+        self.fail('a:1', 2)
+        self.fail('b:1', 2)
+        self.assertIn(views.choose_replica(), {'a:1', 'b:1'})
+
+    def test_status_reports_each_replica(self):
+        self.fail('a:1', 2)
+        self.assertEqual(breaker_stats()['read']['a:1']['state'], OPEN)
+        self.assertEqual(breaker_stats()['read']['b:1']['state'], CLOSED)
+        self.assertEqual(set(limiter_stats()['read']), {'a:1', 'b:1'})
+
+
+def answer(status_code=200, host=None):
+    return SimpleNamespace(status_code=status_code, host=host)
+
+
+def choose_from(hosts):
+    """A ``choose`` that prefers hosts not tried yet, like ReplicaSet.choose"""
+    def choose(exclude=()):
+        return next((host for host in hosts if host not in exclude), hosts[0])
+    return choose
+
+
+class HedgerTests(SimpleTestCase):
+    def hedger(self, budget=None, **kwargs):
+        options = dict(initial_delay=0.02, base_delay=0, max_attempts=3)
+        options.update(kwargs)
+        return Hedger(budget or RetryBudget(), requests.ConnectionError, **options)
+
+    def spent_budget(self):
+        budget = RetryBudget(ratio=0, min_per_second=0, burst=1)
+        self.assertTrue(budget.withdraw())
+        return budget
+
+    def test_slow_attempt_is_hedged_to_another_replica(self):
+        hedger = self.hedger()
+        release = threading.Event()
+        self.addCleanup(release.set)
+        hosts = []
+
+        def attempt(host):
+            hosts.append(host)
+            if host == 'a':
+                release.wait(5)
+            return answer(host=host)
+
+        response = hedger.call(attempt, choose_from(['a', 'b']))
+        self.assertEqual(response.host, 'b')
+        self.assertEqual(hosts, ['a', 'b'])
+        self.assertEqual((hedger.hedges, hedger.hedge_wins), (1, 1))
+
+    def test_fast_attempt_is_not_hedged(self):
+        hedger = self.hedger(initial_delay=5)
+        response = hedger.call(lambda host: answer(host=host), choose_from(['a', 'b']))
+        self.assertEqual((response.host, hedger.hedges), ('a', 0))
+
+    async def test_async_slow_attempt_is_hedged_and_the_loser_cancelled(self):
+        hedger = self.hedger()
+        cancelled = []
+
+        async def attempt(host):
+            if host == 'a':
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    cancelled.append(host)
+                    raise
+            return answer(host=host)
+
+        response = await hedger.acall(attempt, choose_from(['a', 'b']))
+        await asyncio.sleep(0)
+        self.assertEqual(response.host, 'b')
+        self.assertEqual(cancelled, ['a'])
+        self.assertEqual((hedger.hedges, hedger.hedge_wins), (1, 1))
+
+    def test_transient_failures_are_retried_with_backoff(self):
+        hedger = self.hedger(enabled=False)
+        outcomes = [requests.ConnectionError('refused'), answer(503), answer(200)]
+        hosts = []
+
+        def attempt(host):
+            hosts.append(host)
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        with mock.patch.object(hedger, 'backoff', return_value=0) as backoff:
+            response = hedger.call(attempt, choose_from(['a', 'b', 'c']))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(hosts, ['a', 'b', 'c'])
+        self.assertEqual(backoff.call_args_list, [mock.call(1), mock.call(2)])
+        self.assertEqual(hedger.retries, 2)
+
+    def test_retries_stop_at_max_attempts(self):
+        hedger = self.hedger(enabled=False)
+        calls = []
+
+        def attempt(host):
+            calls.append(host)
+            raise requests.ConnectionError('refused')
+
+        with self.assertRaises(requests.ConnectionError):
+            hedger.call(attempt, choose_from(['a']))
+        self.assertEqual(len(calls), 3)
+
+        calls.clear()
+        response = hedger.call(lambda host: calls.append(host) or answer(504), choose_from(['a']))
+        self.assertEqual((response.status_code, len(calls)), (504, 3))
+
+        # Other errors and statuses are returned at once
+        calls.clear()
+        response = hedger.call(lambda host: calls.append(host) or answer(500), choose_from(['a']))
+        self.assertEqual((response.status_code, len(calls)), (500, 1))
+
+    def test_backoff_is_full_jitter_capped_exponential(self):
+        hedger = self.hedger(base_delay=0.1, max_backoff=0.3)
+        for retry, bound in [(1, 0.1), (2, 0.2), (3, 0.3), (6, 0.3)]:
+            delays = [hedger.backoff(retry) for _ in range(50)]
+            self.assertTrue(all(0 <= delay <= bound for delay in delays))
+
+    def test_spent_budget_stops_retries_and_hedges(self):
+        hedger = self.hedger(budget=self.spent_budget(), enabled=False)
+        calls = []
+
+        def attempt(host):
+            calls.append(host)
+            raise requests.ConnectionError('refused')
+
+        with self.assertRaises(requests.ConnectionError):
+            hedger.call(attempt, choose_from(['a', 'b']))
+        self.assertEqual((len(calls), hedger.retries), (1, 0))
+
+        hedger = self.hedger(budget=self.spent_budget())
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def slow(host):
+            release.wait(0.1)
+            return answer(host=host)
+
+        response = hedger.call(slow, choose_from(['a', 'b']))
+        self.assertEqual((response.host, hedger.hedges), ('a', 0))
+        self.assertEqual(hedger.budget.exhausted, 1)
+
+
+class WritesAreNotHedgedTests(SimpleTestCase):
+    """POSTs and batches are not idempotent, so they must reach the write server exactly once"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        hedger_used = AssertionError('writes must not be hedged or retried')
+        for patcher in [mock.patch.object(views.read_hedger, 'call', side_effect=hedger_used),
+                        mock.patch.object(views.async_read_hedger, 'acall', side_effect=hedger_used),
+                        mock.patch.object(views, 'get_service_status', return_value=True),
+                        mock.patch.object(views, 'aget_service_status', mock.AsyncMock(return_value=True))]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def post(self, path, body=b'{"title": "t"}'):
+        return self.factory.post(path, body, content_type='application/json')
+
+    def test_sync_post_and_batch_forward_once(self):
+        upstream = mock.Mock(status_code=201, headers={}, content=b'{}')
+        upstream.json.return_value = {}
+        with mock.patch.object(views, 'forward_request', return_value=upstream) as forward:
+            views.BulkheadView().post(self.post('/bulkhead/'))
+            views.BatchWriteView().post(self.post('/bulkhead/batch/', b'[]'))
+        self.assertEqual([call.args[:2] for call in forward.call_args_list], [('POST', 'write'), ('POST', 'write')])
+
+    async def test_async_post_and_batch_forward_once(self):
+        with mock.patch.object(views, 'aforward_request', mock.AsyncMock()) as forward:
+            await views.AsyncBulkheadView().post(self.post('/bulkhead/'))
+            await views.AsyncBatchWriteView().post(self.post('/bulkhead/batch/', b'[]'))
+        self.assertEqual([call.args[:2] for call in forward.call_args_list], [('POST', 'write'), ('POST', 'write')])
+
+
+class ConditionalGetTests(SimpleTestCase):
+    def test_sync_view_relays_not_modified(self):
+        upstream = requests.Response()
+        upstream.status_code = 304
+        upstream._content = b''
+        upstream.headers.update({'ETag': '"7.1a"', 'Last-Modified': 'Sun, 18 Oct 2026 09:00:00 GMT',
+                                 'Cache-Control': 'no-cache'})
+        request = RequestFactory().get('/bulkhead/', HTTP_IF_NONE_MATCH='"7.1a"')
+
+        with mock.patch.object(views, 'get_service_status', return_value=True), \
+                mock.patch.object(views, 'BULKHEAD_COALESCE', False), \
+                mock.patch.object(views.read_hedger, 'call', lambda attempt, choose: attempt('r:1')), \
+                mock.patch.object(views, 'forward_request', return_value=upstream) as forward:
+            response = views.BulkheadView().get(request)
+
+        self.assertEqual(forward.call_args.kwargs['headers'], {'If-None-Match': '"7.1a"'})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], '"7.1a"')
+        self.assertEqual(response['Last-Modified'], 'Sun, 18 Oct 2026 09:00:00 GMT')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+
+class OkHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+class AsyncPoolLoopTests(SimpleTestCase):
+    def setUp(self):
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), OkHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.pool = AsyncUpstreamPool(f'127.0.0.1:{server.server_address[1]}')
+
+    def get_once(self):
+        async def get():
+            response = await self.pool.send('GET', '/')
+            await response.aread()
+            await self.pool.close_response(response)
+            # The kept-alive socket of this loop's client
+            (connection,) = self.pool._connections(self.pool._get_client())
+            return connection._connection._network_stream.get_extra_info('socket')
+        return asyncio.run(get())
+
+    def test_client_of_a_closed_loop_is_discarded(self):
+        old_socket = self.get_once()
+        self.assertNotEqual(old_socket.fileno(), -1)
+
+        new_socket = self.get_once()
+        self.assertEqual(old_socket.fileno(), -1)
+        self.assertNotEqual(new_socket.fileno(), -1)
+        self.assertLessEqual(self.pool.stats()['clients'], 1)
+        self.assertEqual(self.pool.stats()['requests'], 2)
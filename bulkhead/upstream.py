@@ -0,0 +1,229 @@
+# bulkhead/upstream.py
+import asyncio
+import os
+import socket
+import threading
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from .compartments import compartments
+
+# Pool sizing and timeouts for the upstream database servers. Every upstream call
+# (hedges and retries included) holds a compartment slot, so a pool as large as all
+# the slots together never makes a call wait for, or throw away, a connection
+UPSTREAM_POOL_SIZE = int(os.environ.get(
+    'UPSTREAM_POOL_SIZE', sum(compartment.max_concurrent for compartment in compartments.values())))
+UPSTREAM_POOL_BLOCK = os.environ.get('UPSTREAM_POOL_BLOCK', 'False').lower() == 'true'
+UPSTREAM_KEEPALIVE = os.environ.get('UPSTREAM_KEEPALIVE', 'True').lower() == 'true'
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 3))
+UPSTREAM_READ_TIMEOUT = float(os.environ.get('UPSTREAM_READ_TIMEOUT', 30))
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTP adapter that enables TCP keep-alive probes on pooled sockets"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+        ]
+        super().init_poolmanager(*args, **kwargs)
+
+
+class UpstreamPool:
+    """Per-worker keep-alive connection pool for a single upstream host"""
+
+    def __init__(self, host, pool_size=UPSTREAM_POOL_SIZE, pool_block=UPSTREAM_POOL_BLOCK,
+                 keepalive=UPSTREAM_KEEPALIVE, connect_timeout=UPSTREAM_CONNECT_TIMEOUT,
+                 read_timeout=UPSTREAM_READ_TIMEOUT):
+        self.host = host
+        self.base_url = f'http://{host}'
+        self.pool_size = pool_size
+        self.pool_block = pool_block
+        self.keepalive = keepalive
+        self.timeout = (connect_timeout, read_timeout)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self.session = self._build_session()
+
+    def _build_session(self):
+        session = requests.Session()
+        adapter_class = KeepAliveAdapter if self.keepalive else HTTPAdapter
+        adapter = adapter_class(pool_connections=1,
+                                pool_maxsize=self.pool_size,
+                                pool_block=self.pool_block,
+                                max_retries=0)
+        session.mount('http://', adapter)
+        if not self.keepalive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    def reset(self):
+        """Drop all pooled connections (used after fork)"""
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self.session = self._build_session()
+
+    def request(self, method, path, **kwargs):
+        """Send a request to the upstream reusing a pooled connection"""
+        kwargs.setdefault('timeout', self.timeout)
+        with self._lock:
+            self._in_use += 1
+        try:
+            return self.session.request(method, f'{self.base_url}{path}', **kwargs)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+
+    def stats(self):
+        """Return pool occupancy and connection reuse counters"""
+        pool = self.session.get_adapter(self.base_url).poolmanager.connection_from_url(self.base_url)
+        idle = sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        created = pool.num_connections
+        return {
+            'pool_size': self.pool_size,
+            'in_use': self._in_use,
+            'idle': idle,
+            'created': created,
+            'reused': max(pool.num_requests - created, 0),
+            'keepalive': self.keepalive,
+            'connect_timeout': self.timeout[0],
+            'read_timeout': self.timeout[1],
+        }
+
+
+class AsyncUpstreamPool:
+    """Non-blocking keep-alive connection pool for the async proxy mode"""
+
+    def __init__(self, host, pool_size=UPSTREAM_POOL_SIZE, keepalive=UPSTREAM_KEEPALIVE,
+                 connect_timeout=UPSTREAM_CONNECT_TIMEOUT, read_timeout=UPSTREAM_READ_TIMEOUT):
+        self.host = host
+        self.base_url = f'http://{host}'
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout,
+                                     pool=None if UPSTREAM_POOL_BLOCK else connect_timeout)
+        # httpx clients are bound to the event loop they were first used on, so
+        # each loop gets its own; entries go away with their loop
+        self._clients = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+        self._in_use = 0
+        self._requests = 0
+
+    def _get_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            # Loops running in other threads keep their clients
+            with self._clients_lock:
+                self._discard_closed_loops()
+                client = self._clients[loop] = httpx.AsyncClient(
+                    base_url=self.base_url,
+                    timeout=self.timeout,
+                    limits=httpx.Limits(max_connections=self.pool_size,
+                                        max_keepalive_connections=self.pool_size if self.keepalive else 0),
+                )
+        return client
+
+    def _discard_closed_loops(self):
+        """Drop the clients of loops that have closed, e.g. after each asyncio.run()"""
+        for loop, client in list(self._clients.items()):
+            if loop.is_closed():
+                del self._clients[loop]
+                # aclose() can no longer run on that loop, so close the sockets directly
+                for connection in self._connections(client):
+                    stream = getattr(getattr(connection, '_connection', None), '_network_stream', None)
+                    sock = stream.get_extra_info('socket') if stream is not None else None
+                    if sock is not None:
+                        # asyncio hands out a TransportSocket wrapper around the real socket
+                        getattr(sock, '_sock', sock).close()
+
+    @staticmethod
+    def _connections(client):
+        # httpcore keeps its pool on the transport; only read it for reporting and cleanup
+        pool = getattr(client._transport, '_pool', None)
+        return list(getattr(pool, 'connections', []))
+
+    async def send(self, method, path, **kwargs):
+        """Send a request and return the response with its body still unread"""
+        client = self._get_client()
+        upstream_request = client.build_request(method, path, **kwargs)
+        self._in_use += 1
+        self._requests += 1
+        try:
+            return await client.send(upstream_request, stream=True)
+        except BaseException:
+            self._in_use -= 1
+            raise
+
+    async def close_response(self, response):
+        """Close a response returned by ``send`` and free its connection"""
+        try:
+            await response.aclose()
+        finally:
+            self._in_use -= 1
+
+    def stats(self):
+        connections = [connection for client in list(self._clients.values())
+                       for connection in self._connections(client)]
+        return {
+            'clients': len(self._clients),
+            'pool_size': self.pool_size,
+            'in_use': self._in_use,
+            'idle': sum(1 for conn in connections if conn.is_idle()),
+            'open': len(connections),
+            'requests': self._requests,
+            'keepalive': self.keepalive,
+            'connect_timeout': self.timeout.connect,
+            'read_timeout': self.timeout.read,
+        }
+
+
+_pools = {}
+_async_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host):
+    """Get (or lazily create) the connection pool for an upstream host"""
+    pool = _pools.get(host)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(host)
+            if pool is None:
+                pool = _pools[host] = UpstreamPool(host)
+    return pool
+
+
+def get_async_pool(host):
+    """Get (or lazily create) the async connection pool for an upstream host"""
+    pool = _async_pools.get(host)
+    if pool is None:
+        with _pools_lock:
+            pool = _async_pools.get(host)
+            if pool is None:
+                pool = _async_pools[host] = AsyncUpstreamPool(host)
+    return pool
+
+
+def pool_stats():
+    """Return stats for every upstream pool in this worker"""
+    stats = {host: pool.stats() for host, pool in list(_pools.items())}
+    for host, pool in list(_async_pools.items()):
+        stats[f'{host} (async)'] = pool.stats()
+    return stats
+
+
+def _reset_pools_after_fork():
+    # Sockets inherited from the parent must never be shared between workers
+    global _pools_lock
+    _pools_lock = threading.Lock()
+    for pool in _pools.values():
+        pool.reset()
+    _async_pools.clear()
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
@@ -2,8 +2,16 @@
 from django.urls import path
 from . import views
 
+# Proxy view served for the configured mode (see BULKHEAD_PROXY_MODE)
+if views.PROXY_MODE == 'async':
+    ProxyView, BatchWriteView, ExportView = views.AsyncBulkheadView, views.AsyncBatchWriteView, views.AsyncExportView
+else:
+    ProxyView, BatchWriteView, ExportView = views.BulkheadView, views.BatchWriteView, views.ExportView
+
 urlpatterns = [
-    path('', views.BulkheadView.as_view(), name='bulkhead'),
+    path('', ProxyView.as_view(), name='bulkhead'),
+    path('batch/', BatchWriteView.as_view(), name='batch_write'),
+    path('export/', ExportView.as_view(), name='export'),
     path('toggle/', views.toggle_service, name='toggle_service'),
     path('status/', views.service_status, name='service_status'),
 ]
\ No newline at end of file
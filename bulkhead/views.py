@@ -1,27 +1,269 @@
 # bulkhead/views.py
 import os
+import time
+import httpx
 import requests
-from django.http import JsonResponse
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils.decorators import method_decorator
 from django.views import View
+from ExpMantenibilidad2.metrics import (
+    bulkhead_rejections, upstream_concurrency_limit, upstream_duration, upstream_errors, upstream_in_flight
+)
+from .breaker import CircuitOpen, breakers, breaker_stats
+from .coalesce import BULKHEAD_COALESCE, coalesce_key, read_flight
+from .compartments import CompartmentFull, compartments, compartment_stats
+from .hedging import async_read_hedger, read_hedger
+from .limiter import LoadShed, limiters, limiter_stats
 from .models import ServiceStatus
+from .replicas import read_replicas
+from .status_cache import status_cache
+from .upstream import get_async_pool, get_pool, pool_stats
 import json
 
 # Get database IPs from environment variables
 WRITE_DB_IP = os.environ.get('WRITE_DB_IP', 'localhost:8001')
-READ_DB_IP = os.environ.get('READ_DB_IP', 'localhost:8002')
+
+# 'sync' proxies with BulkheadView (WSGI); 'async' with AsyncBulkheadView (ASGI)
+PROXY_MODE = os.environ.get('BULKHEAD_PROXY_MODE', 'sync').lower()
+# Upstream bodies up to this size are relayed in one piece, larger ones are streamed
+PROXY_BUFFER_LIMIT = int(os.environ.get('PROXY_BUFFER_LIMIT', 256 * 1024))
+PROXY_STREAM_CHUNK_SIZE = int(os.environ.get('PROXY_STREAM_CHUNK_SIZE', 64 * 1024))
+
+FORWARDED_REQUEST_HEADERS = ('Accept', 'Accept-Encoding', 'Content-Type', 'If-None-Match', 'If-Modified-Since')
+RELAYED_RESPONSE_HEADERS = ('Content-Type', 'Content-Encoding', 'Content-Disposition', 'Cache-Control',
+                            'ETag', 'Last-Modified', 'Retry-After', 'Vary')
+
+def track_upstream_hosts():
+    """Create the breaker and limit of every configured host so the status lists them from the start"""
+    for upstream, hosts in [('read', read_replicas.replicas), ('write', [WRITE_DB_IP])]:
+        for host in hosts:
+            breakers[upstream].for_host(host)
+            limiters[upstream].for_host(host)
+
+track_upstream_hosts()
+
+def choose_replica(exclude=()):
+    """Read replica for the next attempt, avoiding those whose breaker is open while others are not"""
+    return read_replicas.choose(exclude=list(exclude) + breakers['read'].refusing_hosts())
 
 def get_service_status(service_name):
-    """Get service status from database"""
+    """Get service status from the in-process cache"""
+    return status_cache.is_enabled(service_name)
+
+async def aget_service_status(service_name):
+    """Async service status check; only leaves the event loop to revalidate"""
+    enabled = status_cache.peek(service_name)
+    if enabled is None:
+        enabled = await sync_to_async(get_service_status)(service_name)
+    return enabled
+
+def compartment_full_response(exc):
+    """Fast 503 for requests rejected by a bulkhead compartment"""
+    bulkhead_rejections.inc('compartment_full')
+    response = JsonResponse({
+        'error': f'{exc.name} service is overloaded, retry later',
+        'status': 'overloaded',
+        'reason': exc.reason
+    }, status=503)
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+def circuit_open_response(exc):
+    """Fast 503 for requests refused by an open upstream circuit breaker"""
+    bulkhead_rejections.inc('circuit_open')
+    response = JsonResponse({
+        'error': f'{exc.name} database is failing, circuit is open',
+        'status': 'circuit_open'
+    }, status=503)
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+def load_shed_response(exc):
+    """Fast 503 for requests shed by an upstream's adaptive concurrency limit"""
+    bulkhead_rejections.inc('load_shed')
+    response = JsonResponse({
+        'error': f'{exc.name} database is at its concurrency limit, retry later',
+        'status': 'shed',
+        'route': exc.route
+    }, status=503)
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+def begin_call(upstream, host):
+    read_replicas.begin(host)
+    upstream_in_flight.inc(upstream)
+
+def finish_call(upstream, route, host, is_probe, started, status_code=None):
+    """Report a finished upstream call (no status: connection error) to the breaker, balancer and metrics"""
+    duration = time.monotonic() - started
+    failed = status_code is None or status_code >= 500
+    breakers[upstream].for_host(host).after_call(is_probe, duration, failed=failed)
+    limiter = limiters[upstream].for_host(host)
+    limiter.release(duration, failed=failed)
+    upstream_concurrency_limit.set(limiter.limit, upstream, host)
+    read_replicas.end(host, duration, failed=failed)
+    upstream_in_flight.dec(upstream)
+    upstream_duration.observe(duration, upstream, route)
+    if failed:
+        upstream_errors.inc(upstream, 'connection' if status_code is None else '5xx')
+
+def cancel_call(upstream, host, is_probe):
+    """Undo begin_call for a call abandoned before it completed"""
+    breakers[upstream].for_host(host).cancel(is_probe)
+    limiters[upstream].for_host(host).release()
+    read_replicas.cancel(host)
+    upstream_in_flight.dec(upstream)
+
+def forward_request(route, upstream, host, method, path, stream=False, **kwargs):
+    """Forward a request through the host's breaker and limit and the route's compartment.
+
+    With ``stream=True`` the body is left unread and the compartment slot stays
+    held; pass the response to ``relay_stream`` to send it and free the slot.
+    """
+    compartment = compartments[route]
+    breaker = breakers[upstream].for_host(host)
+    is_probe = breaker.before_call()
+    try:
+        # Waits in the compartment's queue for a slot within the host's adaptive limit
+        compartment.acquire(limiters[upstream].for_host(host))
+    except BaseException:
+        breaker.cancel(is_probe)
+        raise
+    begin_call(upstream, host)
+    started = time.monotonic()
+    try:
+        response = get_pool(host).request(method, path, stream=stream, **kwargs)
+    except BaseException as e:
+        compartment.release()
+        if isinstance(e, requests.RequestException):
+            finish_call(upstream, route, host, is_probe, started)
+        else:
+            cancel_call(upstream, host, is_probe)
+        raise
+    if not stream:
+        compartment.release()
+    finish_call(upstream, route, host, is_probe, started, response.status_code)
+    return response
+
+def forwarded_headers(request):
+    """Client headers worth passing on to the upstream"""
+    return {name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers}
+
+def relay_headers(upstream_response, response, exclude=()):
+    """Copy the upstream headers the client needs onto our response"""
+    for name in RELAYED_RESPONSE_HEADERS:
+        if name in upstream_response.headers and name not in exclude:
+            response[name] = upstream_response.headers[name]
+    return response
+
+def relay_response(upstream_response):
+    """Relay a requests response body as bytes instead of re-serializing it"""
+    response = HttpResponse(upstream_response.content, status=upstream_response.status_code)
+    # requests has already decoded any Content-Encoding
+    return relay_headers(upstream_response, response, exclude=('Content-Encoding',))
+
+class UpstreamStream:
+    """Relays an upstream body chunk by chunk and frees its compartment slot on close"""
+    
+    def __init__(self, upstream_response, compartment, chunk_size=PROXY_STREAM_CHUNK_SIZE):
+        self.upstream_response = upstream_response
+        self.compartment = compartment
+        self.chunk_size = chunk_size
+        self.closed = False
+    
+    def __iter__(self):
+        try:
+            yield from self.upstream_response.raw.stream(self.chunk_size, decode_content=False)
+        finally:
+            self.close()
+    
+    def close(self):
+        # Called by the WSGI server even if the client went away before the first chunk
+        if not self.closed:
+            self.closed = True
+            self.upstream_response.close()
+            self.compartment.release()
+
+def relay_stream(upstream_response, route):
+    """Stream a response from forward_request(stream=True) without buffering it"""
+    body = UpstreamStream(upstream_response, compartments[route])
+    response = StreamingHttpResponse(body, status=upstream_response.status_code)
+    return relay_headers(upstream_response, response)
+
+class RequestBodyStream:
+    """Iterates the incoming request body in chunks so it is forwarded unbuffered"""
+    
+    def __init__(self, request, chunk_size=PROXY_STREAM_CHUNK_SIZE):
+        self.request = request
+        self.chunk_size = chunk_size
+        self.length = int(request.META.get('CONTENT_LENGTH') or 0)
+    
+    def __len__(self):
+        # requests sends Content-Length when known, chunked encoding otherwise
+        return self.length
+    
+    def __iter__(self):
+        while True:
+            chunk = self.request.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    
+    async def __aiter__(self):
+        for chunk in self:
+            yield chunk
+
+async def aforward_request(route, upstream, host, method, path, buffer=False, **kwargs):
+    """Async forward_request that relays upstream bytes without decoding them.
+
+    Bodies without a Content-Length or above PROXY_BUFFER_LIMIT are streamed
+    unless ``buffer`` is set.
+    """
+    compartment = compartments[route]
+    breaker = breakers[upstream].for_host(host)
+    is_probe = breaker.before_call()
     try:
-        status = ServiceStatus.objects.get(service_name=service_name)
-        return status.is_enabled
-    except ServiceStatus.DoesNotExist:
-        # Create default enabled status if doesn't exist
-        ServiceStatus.objects.create(service_name=service_name, is_enabled=True)
-        return True
+        await compartment.acquire_async(limiters[upstream].for_host(host))
+    except BaseException:
+        # Also when cancelled while queued, e.g. as the losing hedge
+        breaker.cancel(is_probe)
+        raise
+    pool = get_async_pool(host)
+    begin_call(upstream, host)
+    started = time.monotonic()
+    try:
+        upstream_response = await pool.send(method, path, **kwargs)
+    except BaseException as e:
+        compartment.release()
+        if isinstance(e, httpx.HTTPError):
+            finish_call(upstream, route, host, is_probe, started)
+        else:
+            cancel_call(upstream, host, is_probe)
+        raise
+    finish_call(upstream, route, host, is_probe, started, upstream_response.status_code)
+    
+    content_length = upstream_response.headers.get('Content-Length')
+    if buffer or (content_length is not None and int(content_length) <= PROXY_BUFFER_LIMIT):
+        try:
+            body = b''.join([chunk async for chunk in upstream_response.aiter_raw()])
+        finally:
+            await pool.close_response(upstream_response)
+            compartment.release()
+        response = HttpResponse(body, status=upstream_response.status_code)
+    else:
+        async def stream_body():
+            # The compartment slot is held until the last chunk is relayed
+            try:
+                async for chunk in upstream_response.aiter_raw(PROXY_STREAM_CHUNK_SIZE):
+                    yield chunk
+            finally:
+                await pool.close_response(upstream_response)
+                compartment.release()
+        response = StreamingHttpResponse(stream_body(), status=upstream_response.status_code)
+    return relay_headers(upstream_response, response)
 
 @method_decorator(csrf_exempt, name='dispatch')
 class BulkheadView(View):
@@ -35,14 +277,32 @@ class BulkheadView(View):
                 'status': 'disabled'
             }, status=503)
         
+        headers = forwarded_headers(request)
+        
+        def attempt(host):
+            # Forward request to read database, conditional headers included
+            return forward_request('GET', 'read', host, 'GET', '/database/read/',
+                                   params=request.GET.dict(),
+                                   headers=headers)
+        
+        def fetch():
+            # Slow calls are hedged and transient failures retried (GETs are idempotent)
+            response = read_hedger.call(attempt, choose_replica)
+            # Relay status, body and validators as-is so a 304 reaches the client
+            return relay_response(response)
+        
         try:
-            # Forward request to read database
-            response = requests.get(f'http://{READ_DB_IP}/database/read/', 
-                                  params=request.GET.dict(),
-                                  timeout=30)
-            
-            return JsonResponse(response.json(), status=response.status_code)
+            if BULKHEAD_COALESCE:
+                # Identical concurrent GETs share one upstream call
+                return read_flight.do(coalesce_key(request, headers), fetch)
+            return fetch()
             
+        except CircuitOpen as e:
+            return circuit_open_response(e)
+        except LoadShed as e:
+            return load_shed_response(e)
+        except CompartmentFull as e:
+            return compartment_full_response(e)
         except requests.RequestException as e:
             return JsonResponse({
                 'error': 'Failed to connect to read database',
@@ -66,19 +326,205 @@ class BulkheadView(View):
                 return JsonResponse({'error': 'Invalid JSON data'}, status=400)
             
             # Forward request to write database
-            response = requests.post(f'http://{WRITE_DB_IP}/database/write/',
-                                   json=data,
-                                   headers={'Content-Type': 'application/json'},
-                                   timeout=30)
+            response = forward_request('POST', 'write', WRITE_DB_IP, 'POST', '/database/write/',
+                                       json=data,
+                                       headers={'Content-Type': 'application/json'})
             
             return JsonResponse(response.json(), status=response.status_code)
             
+        except CircuitOpen as e:
+            return circuit_open_response(e)
+        except LoadShed as e:
+            return load_shed_response(e)
+        except CompartmentFull as e:
+            return compartment_full_response(e)
         except requests.RequestException as e:
             return JsonResponse({
                 'error': 'Failed to connect to write database',
                 'details': str(e)
             }, status=500)
 
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncBulkheadView(View):
+    """Non-blocking BulkheadView for ASGI that passes upstream bytes straight through"""
+    
+    async def get(self, request):
+        """Handle GET requests - forward to read database"""
+        if not await aget_service_status('GET'):
+            return JsonResponse({
+                'error': 'GET service is currently unavailable',
+                'status': 'disabled'
+            }, status=503)
+        
+        headers = forwarded_headers(request)
+        
+        def attempt(host):
+            # Buffered, so a losing hedge can be dropped without holding a stream open
+            return aforward_request('GET', 'read', host, 'GET', '/database/read/',
+                                    buffer=True,
+                                    params=request.GET.dict(),
+                                    headers=headers)
+        
+        def fetch():
+            # Slow calls are hedged and transient failures retried (GETs are idempotent)
+            return async_read_hedger.acall(attempt, choose_replica)
+        
+        try:
+            if BULKHEAD_COALESCE:
+                return await read_flight.ado(coalesce_key(request, headers), fetch)
+            return await fetch()
+        except CircuitOpen as e:
+            return circuit_open_response(e)
+        except LoadShed as e:
+            return load_shed_response(e)
+        except CompartmentFull as e:
+            return compartment_full_response(e)
+        except httpx.HTTPError as e:
+            return JsonResponse({
+                'error': 'Failed to connect to read database',
+                'details': str(e)
+            }, status=500)
+    
+    async def post(self, request):
+        """Handle POST requests - forward to write database"""
+        if not await aget_service_status('POST'):
+            return JsonResponse({
+                'error': 'POST service is currently unavailable',
+                'status': 'disabled'
+            }, status=503)
+        
+        headers = forwarded_headers(request)
+        headers.setdefault('Content-Type', 'application/json')
+        try:
+            # The write server validates the JSON, so the body is relayed as is
+            return await aforward_request('POST', 'write', WRITE_DB_IP, 'POST', '/database/write/',
+                                          content=request.body,
+                                          headers=headers)
+        except CircuitOpen as e:
+            return circuit_open_response(e)
+        except LoadShed as e:
+            return load_shed_response(e)
+        except CompartmentFull as e:
+            return compartment_full_response(e)
+        except httpx.HTTPError as e:
+            return JsonResponse({
+                'error': 'Failed to connect to write database',
+                'details': str(e)
+            }, status=500)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class BatchWriteView(View):
+    """Forward a JSON array or NDJSON batch to the write database as a stream"""
+    
+    def post(self, request):
+        if not get_service_status('POST'):
+            return JsonResponse({
+                'error': 'POST service is currently unavailable',
+                'status': 'disabled'
+            }, status=503)
+        
+        try:
+            response = forward_request('POST', 'write', WRITE_DB_IP, 'POST', '/database/write/batch/',
+                                       data=RequestBodyStream(request),
+                                       headers={'Content-Type': request.content_type or 'application/json'})
+            return relay_response(response)
+        except CircuitOpen as e:
+            return circuit_open_response(e)
+        except LoadShed as e:
+            return load_shed_response(e)
+        except CompartmentFull as e:
+            return compartment_full_response(e)
+        except requests.RequestException as e:
+            return JsonResponse({
+                'error': 'Failed to connect to write database',
+                'details': str(e)
+            }, status=500)
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncBatchWriteView(View):
+    """Async BatchWriteView for ASGI"""
+    
+    async def post(self, request):
+        if not await aget_service_status('POST'):
+            return JsonResponse({
+                'error': 'POST service is currently unavailable',
+                'status': 'disabled'
+            }, status=503)
+        
+        body = RequestBodyStream(request)
+        headers = {'Content-Type': request.content_type or 'application/json'}
+        if body.length:
+            headers['Content-Length'] = str(body.length)
+        try:
+            return await aforward_request('POST', 'write', WRITE_DB_IP, 'POST', '/database/write/batch/',
+                                          content=body.__aiter__(),
+                                          headers=headers)
+        except CircuitOpen as e:
+            return circuit_open_response(e)
+        except LoadShed as e:
+            return load_shed_response(e)
+        except CompartmentFull as e:
+            return compartment_full_response(e)
+        except httpx.HTTPError as e:
+            return JsonResponse({
+                'error': 'Failed to connect to write database',
+                'details': str(e)
+            }, status=500)
+
+class ExportView(View):
+    """Stream a bulk export from the read database through the EXPORT compartment"""
+    
+    def get(self, request):
+        if not get_service_status('GET'):
+            return JsonResponse({
+                'error': 'GET service is currently unavailable',
+                'status': 'disabled'
+            }, status=503)
+        
+        try:
+            response = forward_request('EXPORT', 'read', choose_replica(), 'GET', '/database/export/',
+                                       stream=True,
+                                       params=request.GET.dict(),
+                                       headers=forwarded_headers(request))
+            return relay_stream(response, 'EXPORT')
+        except CircuitOpen as e:
+            return circuit_open_response(e)
+        except LoadShed as e:
+            return load_shed_response(e)
+        except CompartmentFull as e:
+            return compartment_full_response(e)
+        except requests.RequestException as e:
+            return JsonResponse({
+                'error': 'Failed to connect to read database',
+                'details': str(e)
+            }, status=500)
+
+class AsyncExportView(View):
+    """Async ExportView for ASGI"""
+    
+    async def get(self, request):
+        if not await aget_service_status('GET'):
+            return JsonResponse({
+                'error': 'GET service is currently unavailable',
+                'status': 'disabled'
+            }, status=503)
+        
+        try:
+            return await aforward_request('EXPORT', 'read', choose_replica(), 'GET', '/database/export/',
+                                          params=request.GET.dict(),
+                                          headers=forwarded_headers(request))
+        except CircuitOpen as e:
+            return circuit_open_response(e)
+        except LoadShed as e:
+            return load_shed_response(e)
+        except CompartmentFull as e:
+            return compartment_full_response(e)
+        except httpx.HTTPError as e:
+            return JsonResponse({
+                'error': 'Failed to connect to read database',
+                'details': str(e)
+            }, status=500)
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def toggle_service(request):
@@ -99,6 +545,9 @@ def toggle_service(request):
         status.is_enabled = not status.is_enabled
         status.save()
         
+        # Propagate the toggle to every worker
+        status_cache.invalidate()
+        
         return JsonResponse({
             'service': service_name,
             'status': 'enabled' if status.is_enabled else 'disabled',
@@ -118,7 +567,16 @@ def service_status(request):
         
         return JsonResponse({
             'GET': 'enabled' if get_status else 'disabled',
-            'POST': 'enabled' if post_status else 'disabled'
+            'POST': 'enabled' if post_status else 'disabled',
+            'status_generation': status_cache.generation,
+            'compartments': compartment_stats(),
+            'circuit_breakers': breaker_stats(),
+            'adaptive_limits': limiter_stats(),
+            'upstream_pools': pool_stats(),
+            'read_replicas': read_replicas.stats(),
+            'coalescing': read_flight.stats(),
+            'hedging': (async_read_hedger if PROXY_MODE == 'async' else read_hedger).stats(),
+            'retry_budget': read_hedger.budget.snapshot()
         })
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
@@ -1,6 +1,27 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+def install_search_index(using, **kwargs):
+    from .search import install_search_index
+    install_search_index(using)
+
+
+def install_summary_tables(using, **kwargs):
+    from .summary import install_summary_tables
+    install_summary_tables(using)
 
 
 class DatabaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'database'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # The FTS5 and summary tables and their triggers are raw SQL, so they are (re)created after migrate
+        post_migrate.connect(install_search_index, sender=self)
+        post_migrate.connect(install_summary_tables, sender=self)
+        from .storage import configure_connection
+        # WAL, mmap, cache and busy timeout for every new SQLite connection
+        connection_created.connect(configure_connection)
@@ -0,0 +1,65 @@
+# database/export.py
+import csv
+import json
+import os
+
+from django.db.models import Q
+
+from .models import ReadData
+
+# Rows fetched per query while streaming an export
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 1000))
+
+EXPORT_FIELDS = ['id', 'title', 'content', 'created_at', 'updated_at']
+
+
+def iter_export_batches(since=None, until=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield ReadData rows as tuples in (created_at, id) order, chunk by chunk.
+
+    Every chunk is a separate keyset query on the (created_at, id) index, so
+    memory stays flat and no read transaction is held open between chunks.
+    """
+    queryset = ReadData.objects.order_by('created_at', 'id')
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+
+    last = None
+    while True:
+        batch_queryset = queryset
+        if last is not None:
+            batch_queryset = queryset.filter(created_at__gte=last[3]).filter(
+                Q(created_at__gt=last[3]) | Q(id__gt=last[0]))
+        batch = list(batch_queryset.values_list(*EXPORT_FIELDS)[:chunk_size])
+        if not batch:
+            return
+        yield batch
+        if len(batch) < chunk_size:
+            return
+        last = batch[-1]
+
+
+def _export_row(row):
+    record_id, title, content, created_at, updated_at = row
+    return [record_id, title, content, created_at.isoformat(), updated_at.isoformat()]
+
+
+def ndjson_stream(batches):
+    for batch in batches:
+        yield ''.join(json.dumps(dict(zip(EXPORT_FIELDS, _export_row(row))), ensure_ascii=False) + '\n'
+                      for row in batch)
+
+
+class _LineBuffer:
+    """File-like object for csv.writer that hands back what was written"""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(batches):
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(EXPORT_FIELDS)
+    for batch in batches:
+        yield ''.join(writer.writerow(_export_row(row)) for row in batch)
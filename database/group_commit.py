@@ -0,0 +1,171 @@
+# database/group_commit.py
+import os
+import queue
+import threading
+import time
+
+from django.db import connection, transaction
+
+from .models import WriteData
+from .replication import log_changes
+
+# Opt-in: concurrent write_data calls share one transaction instead of one each
+WRITE_GROUP_COMMIT = os.environ.get('WRITE_GROUP_COMMIT', 'False').lower() == 'true'
+WRITE_GROUP_COMMIT_MAX_ROWS = int(os.environ.get('WRITE_GROUP_COMMIT_MAX_ROWS', 100))
+WRITE_GROUP_COMMIT_MAX_DELAY_MS = float(os.environ.get('WRITE_GROUP_COMMIT_MAX_DELAY_MS', 5))
+# Longest a caller waits for its commit before giving up
+WRITE_GROUP_COMMIT_TIMEOUT = float(os.environ.get('WRITE_GROUP_COMMIT_TIMEOUT', 30))
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class PendingWrite:
+    __slots__ = ('record', 'enqueued_at', 'done', 'error', 'claimed', 'abandoned')
+
+    def __init__(self, record):
+        self.record = record
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.error = None
+        # Set under GroupCommitter._claim_lock: claimed once its batch starts
+        # committing, abandoned if the caller gave up before that
+        self.claimed = False
+        self.abandoned = False
+
+
+class GroupCommitter:
+    """Single committer thread that flushes queued writes in shared transactions.
+
+    The first queued write opens a batch; the batch is committed once it holds
+    ``max_rows`` rows or ``max_delay_ms`` have passed, whichever comes first.
+    Callers block until the transaction holding their row has committed. A
+    caller that times out before its batch started is dropped from it, so a
+    timeout always means the row was not written.
+    """
+
+    def __init__(self, max_rows=WRITE_GROUP_COMMIT_MAX_ROWS, max_delay_ms=WRITE_GROUP_COMMIT_MAX_DELAY_MS,
+                 timeout=WRITE_GROUP_COMMIT_TIMEOUT):
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._claim_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.failed_batches = 0
+        self.abandoned = 0
+        self.max_batch_size = 0
+        self.batch_size_counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self.flush_seconds_total = 0.0
+        self.flush_seconds_max = 0.0
+        self.wait_seconds_total = 0.0
+
+    def submit(self, record):
+        """Queue an unsaved WriteData and return it once durably committed"""
+        self._ensure_started()
+        pending = PendingWrite(record)
+        self._queue.put(pending)
+        if not pending.done.wait(self.timeout):
+            with self._claim_lock:
+                if not pending.claimed:
+                    # Still queued: make sure the committer skips it
+                    pending.abandoned = True
+                    with self._stats_lock:
+                        self.abandoned += 1
+                    raise TimeoutError('Timed out waiting for group commit; the write was not saved')
+            # Its batch is already committing, so wait for the outcome instead of misreporting it
+            pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.record
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            # A thread started before a fork does not exist in the child
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='group-committer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        with self._claim_lock:
+            batch = [pending for pending in batch if not pending.abandoned]
+            for pending in batch:
+                pending.claimed = True
+        if not batch:
+            return
+        started = time.monotonic()
+        failed = False
+        try:
+            self._commit([pending.record for pending in batch])
+        except Exception as e:
+            failed = True
+            for pending in batch:
+                pending.error = e
+            connection.close_if_unusable_or_obsolete()
+        finished = time.monotonic()
+        self._record(batch, finished - started, finished, failed)
+        for pending in batch:
+            pending.done.set()
+
+    def _commit(self, records):
+        with transaction.atomic():
+            created = WriteData.objects.bulk_create(records)
+            log_changes(created)
+
+    def _record(self, batch, flush_seconds, finished, failed):
+        size = len(batch)
+        bucket = next((i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if size <= bound), len(BATCH_SIZE_BUCKETS))
+        with self._stats_lock:
+            self.batches += 1
+            self.failed_batches += failed
+            self.rows += size
+            self.max_batch_size = max(self.max_batch_size, size)
+            self.batch_size_counts[bucket] += 1
+            self.flush_seconds_total += flush_seconds
+            self.flush_seconds_max = max(self.flush_seconds_max, flush_seconds)
+            self.wait_seconds_total += sum(finished - pending.enqueued_at for pending in batch)
+
+    def stats(self):
+        with self._stats_lock:
+            batches = self.batches or 1
+            rows = self.rows or 1
+            histogram = {f'le_{bound}': count for bound, count in zip(BATCH_SIZE_BUCKETS, self.batch_size_counts)}
+            histogram['le_inf'] = self.batch_size_counts[-1]
+            return {
+                'enabled': WRITE_GROUP_COMMIT,
+                'max_rows': self.max_rows,
+                'max_delay_ms': self.max_delay * 1000,
+                'queued': self._queue.qsize(),
+                'batches': self.batches,
+                'failed_batches': self.failed_batches,
+                'abandoned': self.abandoned,
+                'rows': self.rows,
+                'avg_batch_size': round(self.rows / batches, 2),
+                'max_batch_size': self.max_batch_size,
+                'batch_size_histogram': histogram,
+                'avg_flush_ms': round(self.flush_seconds_total / batches * 1000, 3),
+                'max_flush_ms': round(self.flush_seconds_max * 1000, 3),
+                'avg_commit_wait_ms': round(self.wait_seconds_total / rows * 1000, 3),
+            }
+
+
+group_committer = GroupCommitter()
@@ -0,0 +1,122 @@
+# database/ingest.py
+import json
+import os
+
+from django.db import transaction
+
+from .models import WriteData
+from .replication import log_changes
+
+# Rows inserted per bulk_create transaction by the batch write endpoint
+WRITE_BATCH_CHUNK_SIZE = int(os.environ.get('WRITE_BATCH_CHUNK_SIZE', 500))
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+TITLE_MAX_LENGTH = WriteData._meta.get_field('title').max_length
+
+
+class InvalidBatch(ValueError):
+    """Raised when a batch body is not a JSON array"""
+
+
+class BatchInterrupted(Exception):
+    """Raised when a batch stops part way, e.g. on a database error or a dropped client.
+
+    ``results`` covers every row before ``resume_from``; those with an id are
+    committed, so a retry should resend only the rows from ``resume_from`` on.
+    """
+
+    def __init__(self, error, results, resume_from):
+        super().__init__(f'Batch interrupted at row {resume_from}: {error}')
+        self.error = error
+        self.results = results
+        self.resume_from = resume_from
+
+
+def iter_batch_rows(request):
+    """Yield ``(index, row)`` pairs from a JSON array or NDJSON request body.
+
+    NDJSON is read line by line from the request stream, so arbitrarily large
+    bodies never have to fit in memory. Lines that are not valid UTF-8 JSON
+    are yielded as ``None`` so they are reported per row.
+    """
+    if request.content_type in NDJSON_CONTENT_TYPES:
+        index = 0
+        for line in request:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                # JSONDecodeError, or UnicodeDecodeError for a line that is not UTF-8
+                row = None
+            yield index, row
+            index += 1
+        return
+
+    try:
+        rows = json.load(request)
+    except ValueError:
+        raise InvalidBatch('Invalid JSON data')
+    if not isinstance(rows, list):
+        raise InvalidBatch('Expected a JSON array of records')
+    yield from enumerate(rows)
+
+
+def validate_row(row):
+    """Return a WriteData for a valid row, or raise ValueError with the reason"""
+    if not isinstance(row, dict):
+        raise ValueError('Invalid JSON object')
+    title = row.get('title', '')
+    content = row.get('content', '')
+    if not title:
+        raise ValueError('Title is required')
+    if not isinstance(title, str) or not isinstance(content, str):
+        raise ValueError('Title and content must be strings')
+    if len(title) > TITLE_MAX_LENGTH:
+        raise ValueError(f'Title is longer than {TITLE_MAX_LENGTH} characters')
+    return WriteData(title=title, content=content)
+
+
+def insert_batch(rows, chunk_size=WRITE_BATCH_CHUNK_SIZE):
+    """Validate and insert ``(index, row)`` pairs in chunked transactions.
+
+    Each chunk is one bulk_create plus its change log entries, committed
+    together. Returns per-row results ordered by index. If reading the rows
+    or committing a chunk fails, earlier chunks stay committed and
+    ``BatchInterrupted`` reports them.
+    """
+    results = []
+    pending = []
+    next_index = 0
+
+    def flush():
+        with transaction.atomic():
+            created = WriteData.objects.bulk_create([record for _, record in pending])
+            log_changes(created)
+        results.extend({'index': index, 'id': record.id} for (index, _), record in zip(pending, created))
+        pending.clear()
+
+    try:
+        for index, row in rows:
+            next_index = index + 1
+            try:
+                pending.append((index, validate_row(row)))
+            except ValueError as e:
+                results.append({'index': index, 'error': str(e)})
+            if len(pending) >= chunk_size:
+                flush()
+        if pending:
+            flush()
+    except InvalidBatch:
+        raise
+    except Exception as e:
+        # Rows of the chunk being built (or rolled back) were not saved
+        resume_from = pending[0][0] if pending else next_index
+        done = sorted((result for result in results if result['index'] < resume_from),
+                      key=lambda result: result['index'])
+        raise BatchInterrupted(e, done, resume_from) from e
+
+    results.sort(key=lambda result: result['index'])
+    return results
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from database.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ReadData full-text search index in bulk'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Search index rebuilt in {time.monotonic() - started:.2f}s'
+        ))
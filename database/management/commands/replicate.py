@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from database.replication import (
+    REPLICATION_BATCH_SIZE, REPLICATION_POLL_INTERVAL, REPLICATION_SOURCE, Replicator
+)
+from database.storage import allow_writes, read_only
+
+
+class Command(BaseCommand):
+    help = 'Pull the write node change feed and apply it to ReadData (run on read servers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=REPLICATION_SOURCE,
+                            help='host:port of the write server')
+        parser.add_argument('--batch-size', type=int, default=REPLICATION_BATCH_SIZE)
+        parser.add_argument('--interval', type=float, default=REPLICATION_POLL_INTERVAL,
+                            help='seconds to wait between polls once caught up')
+        parser.add_argument('--once', action='store_true',
+                            help='stop as soon as the read node has caught up')
+
+    def handle(self, *args, **options):
+        if read_only():
+            # The server may be query_only; the replicator is the one writer
+            allow_writes(connection)
+        replicator = Replicator(source=options['source'],
+                                batch_size=options['batch_size'],
+                                poll_interval=options['interval'])
+        self.stdout.write(f"Replicating from {options['source']}...")
+        try:
+            replicator.run(stop_when_caught_up=options['once'],
+                           log=lambda message: self.stderr.write(message))
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS('Replication stopped'))
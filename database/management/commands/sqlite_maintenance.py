@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from database.storage import SQLITE_READ_ONLY, allow_writes, current_pragmas, read_only, run_maintenance
+
+
+class Command(BaseCommand):
+    help = 'Checkpoint the SQLite WAL and refresh planner statistics, once or periodically'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='repeat every this many seconds (default: run once)')
+        parser.add_argument('--analyze', action='store_true',
+                            help='run a full ANALYZE instead of relying on PRAGMA optimize')
+        parser.add_argument('--no-checkpoint', action='store_true', help='skip the WAL checkpoint')
+        parser.add_argument('--show', action='store_true', help='print the pragmas in effect and exit')
+
+    def handle(self, *args, **options):
+        if options['show']:
+            for name, value in current_pragmas(connection).items():
+                self.stdout.write(f'{name} = {value}')
+            return
+        if SQLITE_READ_ONLY == 'immutable':
+            raise CommandError('The database is opened immutable; nothing to maintain')
+        if read_only():
+            allow_writes(connection)
+
+        try:
+            while True:
+                started = time.monotonic()
+                run_maintenance(connection, checkpoint=not options['no_checkpoint'],
+                                analyze=options['analyze'], log=lambda message: self.stderr.write(message))
+                self.stdout.write(self.style.SUCCESS(
+                    f'Maintenance done in {time.monotonic() - started:.2f}s'
+                ))
+                if not options['interval']:
+                    break
+                # Don't pin a connection (and its WAL snapshot) while idle
+                connection.close()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
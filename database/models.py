@@ -30,4 +30,126 @@ class ReadData(models.Model):
     
     class Meta:
         db_table = 'read_data'
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Backs keyset (cursor) pagination on (created_at, id)
+            models.Index(fields=['-created_at', '-id'], name='read_data_created_id_idx'),
+        ]
+
+class ChangeLog(models.Model):
+    """Append-only log of WriteData changes; the id is the replication position"""
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    OPERATION_CHOICES = [(UPSERT, 'Upsert'), (DELETE, 'Delete')]
+    
+    id = models.BigAutoField(primary_key=True)
+    record_id = models.IntegerField()
+    operation = models.CharField(max_length=10, choices=OPERATION_CHOICES)
+    title = models.CharField(max_length=200, blank=True)
+    content = models.TextField(blank=True)
+    created_at = models.DateTimeField(null=True)
+    logged_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"#{self.id} {self.operation} {self.record_id}"
+    
+    class Meta:
+        db_table = 'change_log'
+        ordering = ['id']
+
+class ReplicationState(models.Model):
+    """Watermark of the changes a read node has applied from a write node"""
+    source = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    source_head = models.BigIntegerField(default=0)
+    pending_since = models.DateTimeField(null=True)
+    last_applied_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.source} @ {self.position}"
+    
+    class Meta:
+        db_table = 'replication_state'
+
+
+class DataVersion(models.Model):
+    """Monotonic change counter for a table, bumped on every write to it"""
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name}: v{self.version}"
+    
+    class Meta:
+        db_table = 'data_version'
+
+
+class Tag(models.Model):
+    """Report tag, stored once and linked to reports through an indexed join table"""
+    name = models.CharField(max_length=50, unique=True)
+    
+    def __str__(self):
+        return self.name
+    
+    @classmethod
+    def for_names(cls, names):
+        """Map each name to its Tag, creating the missing ones in one statement"""
+        names = set(names)
+        if not names:
+            return {}
+        cls.objects.bulk_create([cls(name=name) for name in names], ignore_conflicts=True)
+        return {tag.name: tag for tag in cls.objects.filter(name__in=names)}
+    
+    class Meta:
+        db_table = 'report_tag'
+        ordering = ['name']
+
+class Report(models.Model):
+    """Tracked report; listed by department, status, priority, tag and due date"""
+    LOW = 'low'
+    MEDIUM = 'medium'
+    HIGH = 'high'
+    CRITICAL = 'critical'
+    PRIORITY_CHOICES = [(LOW, 'Low'), (MEDIUM, 'Medium'), (HIGH, 'High'), (CRITICAL, 'Critical')]
+    
+    OPEN = 'open'
+    IN_PROGRESS = 'in_progress'
+    RESOLVED = 'resolved'
+    CLOSED = 'closed'
+    STATUS_CHOICES = [(OPEN, 'Open'), (IN_PROGRESS, 'In progress'), (RESOLVED, 'Resolved'), (CLOSED, 'Closed')]
+    
+    id = models.AutoField(primary_key=True)
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    author = models.CharField(max_length=100)
+    department = models.CharField(max_length=100)
+    category = models.CharField(max_length=100, blank=True)
+    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default=MEDIUM)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=OPEN)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    due_date = models.DateField(null=True, blank=True)
+    tags = models.ManyToManyField(Tag, related_name='reports', blank=True)
+    
+    def __str__(self):
+        return self.title
+    
+    def get_tags_list(self):
+        # Served from prefetch_related('tags') when the queryset used it
+        return [tag.name for tag in self.tags.all()]
+    
+    def set_tags_list(self, names):
+        self.tags.set(Tag.for_names(names).values())
+    
+    class Meta:
+        db_table = 'report'
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # Each list filter leads an index that also returns rows in list order
+            models.Index(fields=['department', 'status', '-created_at', '-id'], name='report_dept_status_idx'),
+            models.Index(fields=['status', 'priority', '-created_at', '-id'], name='report_status_prio_idx'),
+            models.Index(fields=['due_date', 'status'], name='report_due_status_idx'),
+            models.Index(fields=['-created_at', '-id'], name='report_created_id_idx'),
+        ]
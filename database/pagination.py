@@ -0,0 +1,108 @@
+# database/pagination.py
+import base64
+import json
+import os
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+# Hard upper bound for page_size in every pagination mode
+READ_MAX_PAGE_SIZE = int(os.environ.get('READ_MAX_PAGE_SIZE', 100))
+# Seconds a table count is shared between requests instead of re-running COUNT(*)
+READ_COUNT_CACHE_TTL = int(os.environ.get('READ_COUNT_CACHE_TTL', 30))
+
+
+class InvalidCursor(ValueError):
+    """Raised for cursors that were not produced by ``encode_cursor``"""
+
+
+def parse_page_size(value, default=10):
+    """Parse page_size, clamping it to READ_MAX_PAGE_SIZE"""
+    page_size = int(value if value not in (None, '') else default)
+    if page_size < 1:
+        raise ValueError('page_size must be positive')
+    return min(page_size, READ_MAX_PAGE_SIZE)
+
+
+def encode_cursor(record, direction):
+    """Opaque cursor pointing just past ``record`` in the given direction"""
+    payload = json.dumps([record.created_at.isoformat(), record.id, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, record_id, direction = json.loads(base64.urlsafe_b64decode(padded))
+        created_at = parse_datetime(created_at)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if created_at is None or not isinstance(record_id, int) or direction not in ('next', 'prev'):
+        raise InvalidCursor('Invalid cursor')
+    return created_at, record_id, direction
+
+
+def cached_count(queryset, key):
+    """COUNT(*) shared between requests for READ_COUNT_CACHE_TTL seconds.
+
+    ``key`` should include the data version so a stale total never hides rows.
+    """
+    return cache.get_or_set(f'count:{key}', queryset.count, READ_COUNT_CACHE_TTL)
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that reuses a cached total instead of counting on every page.
+
+    ``counter(queryset, count_key)`` may supply the total some other way.
+    """
+
+    def __init__(self, object_list, per_page, count_key, counter=cached_count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.counter = counter
+
+    @cached_property
+    def count(self):
+        return self.counter(self.object_list, self.count_key)
+
+
+def keyset_page(queryset, cursor, page_size):
+    """Fetch one page ordered by (-created_at, -id) starting after ``cursor``.
+
+    Returns ``(records, pagination)`` where pagination holds the
+    ``next_cursor``/``prev_cursor`` pair. Each page is a single index range
+    scan, so deep pages cost the same as the first one.
+    """
+    direction = 'next'
+    if cursor:
+        created_at, record_id, direction = decode_cursor(cursor)
+        if direction == 'next':
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(id__lt=record_id))
+        else:
+            queryset = queryset.filter(created_at__gte=created_at).filter(
+                Q(created_at__gt=created_at) | Q(id__gt=record_id))
+
+    if direction == 'next':
+        records = list(queryset.order_by('-created_at', '-id')[:page_size + 1])
+    else:
+        records = list(queryset.order_by('created_at', 'id')[:page_size + 1])
+
+    has_more = len(records) > page_size
+    records = records[:page_size]
+    if direction == 'next':
+        has_next, has_previous = has_more, bool(cursor)
+    else:
+        records.reverse()
+        has_next, has_previous = True, has_more
+
+    return records, {
+        'page_size': page_size,
+        'next_cursor': encode_cursor(records[-1], 'next') if has_next and records else None,
+        'prev_cursor': encode_cursor(records[0], 'prev') if has_previous and records else None,
+        'has_next': has_next and bool(records),
+        'has_previous': has_previous and bool(records),
+    }
@@ -0,0 +1,82 @@
+# database/projection.py
+from django.db.models.functions import Substr
+
+READ_FIELDS = ('id', 'title', 'content', 'created_at', 'updated_at')
+# Loaded even when not returned: listings order and build cursors on them
+KEY_FIELDS = ('id', 'created_at')
+DATETIME_FIELDS = ('created_at', 'updated_at')
+
+
+class InvalidProjection(ValueError):
+    """Raised for unknown ``fields`` or a malformed ``preview``"""
+
+
+class Projection:
+    """Which ReadData columns a read request loads and returns.
+
+    Columns that are not asked for are deferred, so a listing of ids and
+    titles never reads ``content`` from disk. With ``preview`` set, only the
+    first ``preview`` characters of ``content`` are selected.
+    """
+
+    def __init__(self, fields=READ_FIELDS, preview=None):
+        self.fields = tuple(field for field in READ_FIELDS if field in fields)
+        self.preview = preview if 'content' in self.fields else None
+
+    @classmethod
+    def from_query(cls, params):
+        """Build a projection from ``?fields=id,title&preview=200``"""
+        fields = READ_FIELDS
+        if params.get('fields'):
+            fields = [field.strip() for field in params['fields'].split(',') if field.strip()]
+            unknown = [field for field in fields if field not in READ_FIELDS]
+            if unknown or not fields:
+                raise InvalidProjection(f'Unknown fields: {", ".join(unknown)}. Use {", ".join(READ_FIELDS)}')
+
+        preview = params.get('preview')
+        if preview in (None, ''):
+            preview = None
+        else:
+            try:
+                preview = int(preview)
+            except ValueError:
+                raise InvalidProjection('Invalid preview length')
+            if preview < 0:
+                raise InvalidProjection('Invalid preview length')
+        return cls(fields, preview)
+
+    @property
+    def is_full(self):
+        return self.fields == READ_FIELDS and self.preview is None
+
+    def columns(self):
+        """Model fields to load from the database"""
+        loaded = set(self.fields) | set(KEY_FIELDS)
+        if self.preview is not None:
+            loaded.discard('content')
+        return [field for field in READ_FIELDS if field in loaded]
+
+    def apply(self, queryset):
+        if self.is_full:
+            return queryset
+        queryset = queryset.only(*self.columns())
+        if self.preview is not None:
+            # One extra character tells whether the content was cut
+            queryset = queryset.annotate(content_preview=Substr('content', 1, self.preview + 1))
+        return queryset
+
+    def serialize(self, record):
+        """Serialize a ReadData row, touching only the loaded fields"""
+        item = {}
+        for field in self.fields:
+            if field == 'content' and self.preview is not None:
+                item['content'] = record.content_preview[:self.preview]
+                item['content_truncated'] = len(record.content_preview) > self.preview
+            elif field in DATETIME_FIELDS:
+                item[field] = getattr(record, field).isoformat()
+            else:
+                item[field] = getattr(record, field)
+        return item
+
+
+FULL_PROJECTION = Projection()
@@ -0,0 +1,162 @@
+# database/replication.py
+import os
+import time
+
+import requests
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ChangeLog, ReadData, ReplicationState
+from .versioning import bump_data_version
+
+# Write node the read node pulls its change feed from
+REPLICATION_SOURCE = os.environ.get('REPLICATION_SOURCE', os.environ.get('WRITE_DB_IP', 'localhost:8001'))
+REPLICATION_BATCH_SIZE = int(os.environ.get('REPLICATION_BATCH_SIZE', 500))
+REPLICATION_MAX_BATCH_SIZE = 5000
+REPLICATION_POLL_INTERVAL = float(os.environ.get('REPLICATION_POLL_INTERVAL', 1.0))
+REPLICATION_TIMEOUT = float(os.environ.get('REPLICATION_TIMEOUT', 10))
+
+
+# Write side
+
+def log_changes(records, operation=ChangeLog.UPSERT):
+    """Append WriteData rows to the change log in one bulk insert.
+
+    Single saves are logged by the WriteData signals; bulk paths that bypass
+    signals must call this inside the same transaction as their insert.
+    """
+    ChangeLog.objects.bulk_create([
+        ChangeLog(record_id=record.id,
+                  operation=operation,
+                  title=record.title if operation == ChangeLog.UPSERT else '',
+                  content=record.content if operation == ChangeLog.UPSERT else '',
+                  created_at=record.created_at)
+        for record in records
+    ])
+
+
+def changes_after(position, limit):
+    """One page of the change feed: every change logged after ``position``"""
+    changes = list(ChangeLog.objects.filter(id__gt=position).order_by('id')[:limit])
+    last_position = changes[-1].id if changes else position
+    head = ChangeLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    next_change = (ChangeLog.objects.filter(id__gt=last_position).order_by('id')
+                   .values_list('logged_at', flat=True).first())
+    return {
+        'changes': [{
+            'position': change.id,
+            'record_id': change.record_id,
+            'operation': change.operation,
+            'title': change.title,
+            'content': change.content,
+            'created_at': change.created_at.isoformat() if change.created_at else None,
+            'logged_at': change.logged_at.isoformat()
+        } for change in changes],
+        'last_position': last_position,
+        'head_position': head,
+        'next_logged_at': next_change.isoformat() if next_change else None
+    }
+
+
+# Read side
+
+def get_replication_state(source=REPLICATION_SOURCE):
+    """Watermark row of ``source``, created on first use (only the replicator writes it)"""
+    state, _ = ReplicationState.objects.get_or_create(source=source)
+    return state
+
+
+def find_replication_state(source=REPLICATION_SOURCE):
+    """Watermark row of ``source`` without writing, or None before the first replication"""
+    return ReplicationState.objects.filter(source=source).first()
+
+
+def apply_changes(state, feed):
+    """Apply one change-feed batch and advance the watermark atomically.
+
+    Changes are collapsed to the last operation per record, then upserted
+    with a single bulk_create and deleted with a single query. Upserts match
+    on the WriteData id, so positive ReadData ids belong to the change feed;
+    rows seeded straight into a read node must use ids below zero (see
+    populate_db.py). Returns the number of changes consumed.
+    """
+    changes = feed['changes']
+    latest = {}
+    for change in changes:
+        latest[change['record_id']] = change
+
+    upserts = [ReadData(id=record_id,
+                        title=change['title'],
+                        content=change['content'],
+                        created_at=parse_datetime(change['created_at']) or timezone.now())
+               for record_id, change in latest.items() if change['operation'] == ChangeLog.UPSERT]
+    deletes = [record_id for record_id, change in latest.items() if change['operation'] == ChangeLog.DELETE]
+
+    with transaction.atomic():
+        if upserts:
+            ReadData.objects.bulk_create(upserts,
+                                         update_conflicts=True,
+                                         unique_fields=['id'],
+                                         update_fields=['title', 'content', 'created_at', 'updated_at'])
+        if deletes:
+            ReadData.objects.filter(id__in=deletes).delete()
+        state.position = feed['last_position']
+        state.source_head = max(feed['head_position'], state.position)
+        state.pending_since = parse_datetime(feed['next_logged_at']) if feed['next_logged_at'] else None
+        if changes:
+            state.last_applied_at = timezone.now()
+        state.save()
+        if changes:
+            bump_data_version()
+    return len(changes)
+
+
+def replication_lag(state):
+    """Replication lag in rows and seconds for a read node"""
+    rows = max(state.source_head - state.position, 0)
+    seconds = 0.0
+    if rows and state.pending_since:
+        seconds = max((timezone.now() - state.pending_since).total_seconds(), 0.0)
+    return {'rows': rows, 'seconds': round(seconds, 3)}
+
+
+class Replicator:
+    """Pulls the change feed from a write node and applies it to ReadData"""
+
+    def __init__(self, source=REPLICATION_SOURCE, batch_size=REPLICATION_BATCH_SIZE,
+                 poll_interval=REPLICATION_POLL_INTERVAL):
+        self.source = source
+        self.batch_size = min(batch_size, REPLICATION_MAX_BATCH_SIZE)
+        self.poll_interval = poll_interval
+        self.session = requests.Session()
+
+    def fetch(self, position):
+        response = self.session.get(f'http://{self.source}/database/changes/',
+                                    params={'after': position, 'limit': self.batch_size},
+                                    timeout=REPLICATION_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def pull_once(self):
+        """Fetch and apply one batch; returns the number of changes applied"""
+        state = get_replication_state(self.source)
+        return apply_changes(state, self.fetch(state.position))
+
+    def run(self, stop_when_caught_up=False, log=print):
+        """Replicate until interrupted, sleeping only when caught up"""
+        while True:
+            try:
+                applied = self.pull_once()
+            except requests.RequestException as e:
+                log(f'Replication fetch from {self.source} failed: {e}')
+                applied = 0
+            except DatabaseError as e:
+                # e.g. "database is locked" under heavy reads; the batch rolled back, retry it
+                log(f'Applying changes from {self.source} failed: {e}')
+                connection.close_if_unusable_or_obsolete()
+                applied = 0
+            if applied < self.batch_size:
+                if stop_when_caught_up:
+                    return
+                time.sleep(self.poll_interval)
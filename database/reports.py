@@ -0,0 +1,50 @@
+# database/reports.py
+from django.utils.dateparse import parse_date
+
+from .models import Report
+
+
+class InvalidReportFilter(ValueError):
+    """Raised for list filters that do not match a Report field's values"""
+
+
+def _parse_choices(value, choices, name):
+    values = [item.strip() for item in value.split(',') if item.strip()]
+    allowed = {choice for choice, _ in choices}
+    unknown = [item for item in values if item not in allowed]
+    if unknown:
+        raise InvalidReportFilter(f'Unknown {name}: {", ".join(unknown)}. Use {", ".join(sorted(allowed))}')
+    return values
+
+
+def _parse_due(value, name):
+    day = parse_date(value)
+    if day is None:
+        raise InvalidReportFilter(f'Invalid {name}: {value}')
+    return day
+
+
+def filter_reports(params):
+    """Reports matching the list query parameters, with their tags prefetched.
+
+    ``department``, ``status`` and ``priority`` (comma-separated for several
+    values) lead the composite indexes; every ``tag`` given must be present;
+    ``due_after``/``due_before`` bound the due date inclusively.
+    """
+    queryset = Report.objects.all()
+    if params.get('department'):
+        queryset = queryset.filter(department=params['department'])
+    if params.get('status'):
+        queryset = queryset.filter(status__in=_parse_choices(params['status'], Report.STATUS_CHOICES, 'status'))
+    if params.get('priority'):
+        queryset = queryset.filter(
+            priority__in=_parse_choices(params['priority'], Report.PRIORITY_CHOICES, 'priority'))
+    if params.get('due_after'):
+        queryset = queryset.filter(due_date__gte=_parse_due(params['due_after'], 'due_after'))
+    if params.get('due_before'):
+        queryset = queryset.filter(due_date__lte=_parse_due(params['due_before'], 'due_before'))
+    for tag in params.getlist('tag'):
+        # One join per tag, so a report must carry all of them
+        queryset = queryset.filter(tags__name=tag)
+    # One extra query loads the tags of the whole page
+    return queryset.prefetch_related('tags')
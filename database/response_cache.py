@@ -0,0 +1,71 @@
+# database/response_cache.py
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+# Memory budget (bytes of serialized JSON) for cached read responses per worker
+READ_CACHE_MAX_BYTES = int(os.environ.get('READ_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+READ_CACHE_ENABLED = os.environ.get('READ_CACHE_ENABLED', 'True').lower() == 'true'
+
+
+class ResponseCache:
+    """LRU cache of serialized responses tagged with the data version they came from.
+
+    An entry is only served while its version matches the current data
+    version, so a bump invalidates every entry without having to walk them.
+    """
+
+    def __init__(self, max_bytes=READ_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query_dict):
+        """Normalize query parameters so equivalent requests share an entry"""
+        return urlencode(sorted((key, value) for key, values in query_dict.lists() for value in values))
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, version, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[1])
+            self._entries[key] = (version, body)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'enabled': READ_CACHE_ENABLED,
+            'entries': len(self._entries),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,118 @@
+# database/search.py
+import re
+
+from django.db import connections
+
+from .models import ReadData
+from .projection import FULL_PROJECTION
+
+FTS_TABLE = 'read_data_fts'
+
+# External-content FTS5 index over read_data, kept in sync by triggers so every
+# write path (ORM saves, bulk_create, replication upserts) is indexed
+CREATE_INDEX_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, content,
+    content='read_data', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+)
+"""
+
+CREATE_TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON read_data BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON read_data BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, content ON read_data BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+TRIGGER_NAMES = [f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au']
+
+# bm25 column weights: a match in the title ranks above one in the content
+TITLE_WEIGHT = 5.0
+CONTENT_WEIGHT = 1.0
+SNIPPET_TOKENS = 12
+
+
+def install_search_index(using='default'):
+    """Create the FTS5 table and its sync triggers if they are missing"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or ReadData._meta.db_table not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_INDEX_SQL)
+        for statement in CREATE_TRIGGERS_SQL:
+            cursor.execute(statement)
+
+
+def drop_search_triggers(using='default'):
+    """Stop incremental indexing, e.g. during a bulk load followed by a rebuild"""
+    with connections[using].cursor() as cursor:
+        for name in TRIGGER_NAMES:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def rebuild_search_index(using='default'):
+    """Re-index every read_data row in bulk and compact the index"""
+    install_search_index(using)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def build_match_query(q):
+    """Turn free text into an FTS5 query that matches all terms.
+
+    Terms are quoted so user input can never be parsed as FTS5 syntax.
+    """
+    terms = re.findall(r'\w+', q)
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def search_records(q, offset, limit, snippets=False, projection=FULL_PROJECTION):
+    """Ranked ReadData matches for ``q``; each has ``rank`` and optionally ``snippet``.
+
+    Only the columns in ``projection`` are selected; the rest stay deferred.
+    """
+    match = build_match_query(q)
+    if not match:
+        return []
+    params = []
+    columns = ', '.join(f'read_data.{column}' for column in projection.columns())
+    if projection.preview is not None:
+        columns += ', substr(read_data.content, 1, %s) AS content_preview'
+        params.append(projection.preview + 1)
+    snippet_sql = (f", snippet({FTS_TABLE}, -1, '<b>', '</b>', '…', {SNIPPET_TOKENS}) AS snippet"
+                   if snippets else '')
+    return list(ReadData.objects.raw(
+        f"""
+        SELECT {columns}, bm25({FTS_TABLE}, {TITLE_WEIGHT}, {CONTENT_WEIGHT}) AS rank{snippet_sql}
+        FROM {FTS_TABLE} JOIN read_data ON read_data.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s
+        ORDER BY rank
+        LIMIT %s OFFSET %s
+        """,
+        params + [match, limit, offset]
+    ))
+
+
+def count_matches(q):
+    match = build_match_query(q)
+    if not match:
+        return 0
+    with connections['default'].cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+        return cursor.fetchone()[0]
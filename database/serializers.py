@@ -1,13 +1,76 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Report
+from .models import Report, Tag
+
+class TagListField(serializers.ListField):
+    """Tags as a list of names; reads the prefetched tags instead of querying per report"""
+
+    child = serializers.CharField(max_length=50)
+
+    def to_representation(self, value):
+        return [tag.name for tag in value.all()]
+
+    def to_internal_value(self, data):
+        names = [name.strip() for name in super().to_internal_value(data)]
+        # Drop blanks and duplicates, keep the given order
+        return list(dict.fromkeys(name for name in names if name))
+
+class ReportListSerializer(serializers.ListSerializer):
+    """Creates and updates many reports with a fixed number of queries"""
+
+    def create(self, validated_data):
+        tag_names = [item.pop('tags', None) or [] for item in validated_data]
+        for item in validated_data:
+            item.pop('id', None)
+        with transaction.atomic():
+            reports = Report.objects.bulk_create([Report(**item) for item in validated_data])
+            set_report_tags(reports, tag_names)
+        return list(Report.objects.filter(id__in=[report.id for report in reports])
+                    .order_by('id').prefetch_related('tags'))
+
+    def update(self, instance, validated_data):
+        reports = {report.id: report for report in instance}
+        missing = [item.get('id') for item in validated_data if item.get('id') not in reports]
+        if missing:
+            raise serializers.ValidationError({'id': f'Unknown report ids: {missing}'})
+
+        now = timezone.now()
+        fields = {'updated_at'}
+        retagged, tag_names = [], []
+        for item in validated_data:
+            report = reports[item.pop('id')]
+            names = item.pop('tags', None)
+            if names is not None:
+                retagged.append(report)
+                tag_names.append(names)
+            for attr, value in item.items():
+                setattr(report, attr, value)
+                fields.add(attr)
+            report.updated_at = now
+
+        with transaction.atomic():
+            Report.objects.bulk_update(reports.values(), sorted(fields))
+            if retagged:
+                Report.tags.through.objects.filter(report__in=retagged).delete()
+                set_report_tags(retagged, tag_names)
+        return list(Report.objects.filter(id__in=reports).order_by('id').prefetch_related('tags'))
+
+def set_report_tags(reports, tag_names):
+    """Link each report to its tag names (creating missing tags) in bulk"""
+    tags = Tag.for_names(name for names in tag_names for name in names)
+    Report.tags.through.objects.bulk_create([
+        Report.tags.through(report_id=report.id, tag_id=tags[name].id)
+        for report, names in zip(reports, tag_names) for name in names
+    ], ignore_conflicts=True)
 
 class ReportSerializer(serializers.ModelSerializer):
-    tags_list = serializers.ListField(
-        child=serializers.CharField(max_length=50),
-        write_only=True,
-        required=False
-    )
-    
+    # Only used to match items to reports in bulk updates
+    id = serializers.IntegerField(required=False)
+    tags = TagListField(required=False)
+    # Accepted as an alias of tags for older clients
+    tags_list = TagListField(write_only=True, required=False)
+
     class Meta:
         model = Report
         fields = [
@@ -15,31 +78,38 @@ class ReportSerializer(serializers.ModelSerializer):
             'category', 'priority', 'status', 'created_at', 'updated_at',
             'due_date', 'tags', 'tags_list'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
-    
+        read_only_fields = ['created_at', 'updated_at']
+        list_serializer_class = ReportListSerializer
+
+    def validate(self, attrs):
+        tags_list = attrs.pop('tags_list', None)
+        if tags_list is not None and 'tags' not in attrs:
+            attrs['tags'] = tags_list
+        return attrs
+
     def create(self, validated_data):
-        tags_list = validated_data.pop('tags_list', [])
-        report = Report.objects.create(**validated_data)
-        
-        if tags_list:
-            report.set_tags_list(tags_list)
-            report.save()
-        
+        tags = validated_data.pop('tags', [])
+        validated_data.pop('id', None)
+        with transaction.atomic():
+            report = Report.objects.create(**validated_data)
+            if tags:
+                report.set_tags_list(tags)
         return report
-    
+
     def update(self, instance, validated_data):
-        tags_list = validated_data.pop('tags_list', None)
-        
+        tags = validated_data.pop('tags', None)
+        validated_data.pop('id', None)
+
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        
-        if tags_list is not None:
-            instance.set_tags_list(tags_list)
-        
-        instance.save()
+
+        with transaction.atomic():
+            instance.save()
+            if tags is not None:
+                instance.set_tags_list(tags)
         return instance
-    
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data['tags_list'] = instance.get_tags_list()
-        return data
\ No newline at end of file
+        data['tags_list'] = data['tags']
+        return data
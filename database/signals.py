@@ -0,0 +1,25 @@
+# database/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ChangeLog, ReadData, WriteData
+from .replication import log_changes
+from .versioning import bump_data_version
+
+
+@receiver(post_save, sender=ReadData)
+@receiver(post_delete, sender=ReadData)
+def read_data_changed(sender, **kwargs):
+    """Invalidate read caches whenever a ReadData row changes"""
+    bump_data_version()
+
+
+@receiver(post_save, sender=WriteData)
+def write_data_saved(sender, instance, **kwargs):
+    """Append every saved WriteData row to the replication change log"""
+    log_changes([instance])
+
+
+@receiver(post_delete, sender=WriteData)
+def write_data_deleted(sender, instance, **kwargs):
+    log_changes([instance], operation=ChangeLog.DELETE)
@@ -0,0 +1,106 @@
+# database/storage.py
+import os
+
+from django.conf import settings
+
+# Per-role SQLite tuning applied to every new connection (see configure_connection)
+SERVER_TYPE = settings.SERVER_TYPE
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'True').lower() == 'true'
+
+# Defaults per role; each one can be overridden with SQLITE_<NAME>
+ROLE_DEFAULTS = {
+    # WAL lets the read-heavy nodes serve readers while a writer commits.
+    # synchronous=FULL fsyncs the WAL on every commit, so an acknowledged write
+    # survives a power loss; NORMAL only fsyncs at checkpoints and may lose the
+    # last commits, which the other roles can afford (a read node pulls them
+    # again from the change feed, whose watermark is rolled back with them)
+    'write': {'journal_mode': 'WAL', 'synchronous': 'FULL', 'mmap_size': 256 * 1024 * 1024,
+              'cache_size': -64000, 'busy_timeout': 5000, 'temp_store': 'MEMORY', 'wal_autocheckpoint': 1000},
+    'read': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'mmap_size': 512 * 1024 * 1024,
+             'cache_size': -128000, 'busy_timeout': 5000, 'temp_store': 'MEMORY', 'wal_autocheckpoint': 1000},
+    # The bulkhead database only holds the service toggles
+    'bulkhead': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'mmap_size': 0,
+                 'cache_size': -2000, 'busy_timeout': 5000, 'temp_store': 'MEMORY', 'wal_autocheckpoint': 1000},
+}
+ROLE_DEFAULTS['both'] = ROLE_DEFAULTS['write']
+
+SQLITE_PRAGMAS = {
+    name: os.environ.get(f'SQLITE_{name.upper()}', default)
+    for name, default in ROLE_DEFAULTS.get(SERVER_TYPE, ROLE_DEFAULTS['write']).items()
+}
+
+# Read node only: 'query_only' refuses writes on the server's connections (the
+# replicate and maintenance commands lift it); 'immutable' also skips all locking
+# and change detection, so it is only safe for a snapshot nobody writes to
+SQLITE_READ_ONLY = os.environ.get('SQLITE_READ_ONLY', 'off').lower() if SERVER_TYPE == 'read' else 'off'
+
+# Set by commands that must write even when the server itself is read-only
+_writes_allowed = False
+
+
+def allow_writes(connection):
+    """Lift SQLITE_READ_ONLY for this process and reopen ``connection`` without it"""
+    global _writes_allowed
+    if SQLITE_READ_ONLY == 'immutable':
+        raise RuntimeError('The database is opened immutable; unset SQLITE_READ_ONLY to write to it')
+    _writes_allowed = True
+    connection.close()
+
+
+def read_only():
+    return SQLITE_READ_ONLY in ('query_only', 'immutable') and not _writes_allowed
+
+
+def connection_pragmas():
+    """The ``(name, value)`` pragmas configure_connection applies, in order"""
+    if not SQLITE_TUNING:
+        pragmas = []
+    elif SQLITE_READ_ONLY == 'immutable':
+        # Nothing is written, so only the read-side pragmas apply
+        pragmas = [(name, SQLITE_PRAGMAS[name]) for name in ('mmap_size', 'cache_size', 'temp_store')]
+    else:
+        pragmas = list(SQLITE_PRAGMAS.items())
+    if read_only() and SQLITE_READ_ONLY == 'query_only':
+        # Last, so the journal mode can still be switched first
+        pragmas.append(('query_only', 'ON'))
+    return pragmas
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created receiver: apply the role's pragmas to a new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in connection_pragmas():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def current_pragmas(connection):
+    """Values SQLite reports for the tuned pragmas on ``connection``"""
+    names = list(SQLITE_PRAGMAS) + ['query_only']
+    with connection.cursor() as cursor:
+        values = {}
+        for name in names:
+            cursor.execute(f'PRAGMA {name}')
+            row = cursor.fetchone()
+            values[name] = row[0] if row else None
+    return values
+
+
+def run_maintenance(connection, checkpoint=True, analyze=True, log=None):
+    """Checkpoint the WAL and refresh query planner statistics.
+
+    ``PRAGMA optimize`` only re-analyzes tables whose statistics are stale,
+    so it is cheap to run often; a full ``ANALYZE`` rescans every index.
+    """
+    log = log or (lambda message: None)
+    with connection.cursor() as cursor:
+        if checkpoint and SQLITE_READ_ONLY != 'immutable':
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            busy, wal_pages, checkpointed = cursor.fetchone()
+            log(f'WAL checkpoint: {checkpointed}/{wal_pages} pages' + (' (busy)' if busy else ''))
+        if analyze:
+            cursor.execute('ANALYZE')
+            log('ANALYZE done')
+        cursor.execute('PRAGMA optimize')
+        log('PRAGMA optimize done')
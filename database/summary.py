@@ -0,0 +1,131 @@
+# database/summary.py
+from django.db import OperationalError, connections, transaction
+
+from .models import ReadData
+
+TOTALS_TABLE = 'read_data_totals'
+DAILY_TABLE = 'read_data_daily'
+HOURLY_TABLE = 'read_data_hourly'
+
+# created_at is stored as UTC text ('YYYY-MM-DD HH:MM:SS.ffffff'), so buckets are prefixes of it
+DAY_BUCKET = "substr({row}.created_at, 1, 10)"
+HOUR_BUCKET = "substr({row}.created_at, 1, 13) || ':00'"
+BUCKET_TABLES = {'day': (DAILY_TABLE, DAY_BUCKET), 'hour': (HOURLY_TABLE, HOUR_BUCKET)}
+
+CREATE_TABLES_SQL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {TOTALS_TABLE} (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total INTEGER NOT NULL
+    )
+    """,
+    f"CREATE TABLE IF NOT EXISTS {DAILY_TABLE} (bucket TEXT PRIMARY KEY, count INTEGER NOT NULL) WITHOUT ROWID",
+    f"CREATE TABLE IF NOT EXISTS {HOURLY_TABLE} (bucket TEXT PRIMARY KEY, count INTEGER NOT NULL) WITHOUT ROWID",
+]
+
+
+def _adjust(row, delta):
+    """Statements adding ``delta`` to the total and to ``row``'s buckets"""
+    statements = [
+        f"INSERT INTO {TOTALS_TABLE}(id, total) VALUES (1, {delta}) "
+        f"ON CONFLICT(id) DO UPDATE SET total = total + {delta};"
+    ]
+    for table, bucket in BUCKET_TABLES.values():
+        bucket = bucket.format(row=row)
+        statements.append(f"INSERT INTO {table}(bucket, count) VALUES ({bucket}, {delta}) "
+                          f"ON CONFLICT(bucket) DO UPDATE SET count = count + {delta};")
+        if delta < 0:
+            statements.append(f"DELETE FROM {table} WHERE bucket = {bucket} AND count <= 0;")
+    return '\n'.join(statements)
+
+
+# Kept in sync by triggers, like the search index, so every write path
+# (ORM saves, bulk_create, replication upserts and deletes) is counted
+CREATE_TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS read_data_summary_ai AFTER INSERT ON read_data BEGIN
+        {_adjust('new', 1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS read_data_summary_ad AFTER DELETE ON read_data BEGIN
+        {_adjust('old', -1)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS read_data_summary_au AFTER UPDATE OF created_at ON read_data
+    WHEN {HOUR_BUCKET.format(row='old')} IS NOT {HOUR_BUCKET.format(row='new')} BEGIN
+        {_adjust('old', -1)}
+        {_adjust('new', 1)}
+    END
+    """,
+]
+
+TRIGGER_NAMES = ['read_data_summary_ai', 'read_data_summary_ad', 'read_data_summary_au']
+
+
+def install_summary_tables(using='default'):
+    """Create the summary tables and triggers, backfilling them the first time"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or ReadData._meta.db_table not in connection.introspection.table_names():
+        return
+    fresh = TOTALS_TABLE not in connection.introspection.table_names()
+    with connection.cursor() as cursor:
+        for statement in CREATE_TABLES_SQL + CREATE_TRIGGERS_SQL:
+            cursor.execute(statement)
+    if fresh:
+        rebuild_summary(using)
+
+
+def drop_summary_triggers(using='default'):
+    """Stop incremental counting, e.g. during a bulk load followed by a rebuild"""
+    with connections[using].cursor() as cursor:
+        for name in TRIGGER_NAMES:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+
+
+def rebuild_summary(using='default'):
+    """Recount every summary table from read_data in one transaction and restore the triggers"""
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        for statement in CREATE_TABLES_SQL + CREATE_TRIGGERS_SQL:
+            cursor.execute(statement)
+        cursor.execute(f'DELETE FROM {TOTALS_TABLE}')
+        cursor.execute(f'INSERT INTO {TOTALS_TABLE}(id, total) SELECT 1, COUNT(*) FROM read_data')
+        for table, bucket in BUCKET_TABLES.values():
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(f'INSERT INTO {table}(bucket, count) '
+                           f'SELECT {bucket.format(row="read_data")}, COUNT(*) FROM read_data GROUP BY 1')
+
+
+def maintained_total(using='default'):
+    """Row count of read_data from the summary table, or None if it is not installed"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(f'SELECT total FROM {TOTALS_TABLE} WHERE id = 1')
+        except OperationalError:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def bucket_counts(granularity='day', since=None, until=None, using='default'):
+    """``[(bucket, count)]`` in bucket order, optionally within [since, until].
+
+    Bounds are compared as bucket label prefixes, so ``until='2026-10-18'``
+    includes every hour of that day.
+    """
+    table, _ = BUCKET_TABLES[granularity]
+    conditions, params = [], []
+    if since:
+        conditions.append('bucket >= %s')
+        params.append(since)
+    if until:
+        conditions.append('bucket < %s')
+        params.append(until + '\uffff')
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'SELECT bucket, count FROM {table}{where} ORDER BY bucket', params)
+        return cursor.fetchall()
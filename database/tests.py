@@ -1,3 +1,474 @@
-from django.test import TestCase
+import importlib
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ExpMantenibilidad2 import urls as project_urls
+
+from . import ingest, replication, summary, views
+from .group_commit import GroupCommitter
+from .models import ChangeLog, ReadData, ReplicationState, Report, WriteData
+
+
+@override_settings(ROOT_URLCONF='database.urls')
+class RoleTestCase(TestCase):
+    """Serves database.urls at the root as the ``server_type`` role"""
+    server_type = 'both'
+
+    def setUp(self):
+        patcher = mock.patch.object(views, 'SERVER_TYPE', self.server_type)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class BlockingCommitter(GroupCommitter):
+    """Records what it commits and holds each commit until ``proceed`` is set"""
+
+    def __init__(self, **kwargs):
+        super().__init__(max_delay_ms=0, **kwargs)
+        self.committing = threading.Event()
+        self.proceed = threading.Event()
+        self.committed = []
+
+    def _commit(self, records):
+        self.committing.set()
+        self.proceed.wait(5)
+        for index, record in enumerate(records, start=len(self.committed) + 1):
+            record.id = index
+        self.committed.extend(records)
+
+
+class GroupCommitTimeoutTests(SimpleTestCase):
+    def submit_in_background(self, committer, record):
+        result = {}
+
+        def submit():
+            try:
+                result['record'] = committer.submit(record)
+            except Exception as e:
+                result['error'] = e
+
+        thread = threading.Thread(target=submit)
+        thread.start()
+        return thread, result
+
+    def test_write_still_queued_at_timeout_is_never_committed(self):
+        committer = BlockingCommitter(timeout=0.05)
+        first = WriteData(title='first')
+        # The committer thread is busy with the first batch while the second write times out
+        thread, result = self.submit_in_background(committer, first)
+        self.assertTrue(committer.committing.wait(5))
+        with self.assertRaises(TimeoutError):
+            committer.submit(WriteData(title='second'))
+
+        committer.proceed.set()
+        thread.join(5)
+        self.assertIs(result['record'], first)
+        # Queued after the abandoned write, so that one has been skipped once this returns
+        committer.submit(WriteData(title='third'))
+        self.assertEqual([record.title for record in committer.committed], ['first', 'third'])
+        self.assertEqual(committer.stats()['abandoned'], 1)
+
+    def test_timeout_during_its_commit_waits_for_the_outcome(self):
+        committer = BlockingCommitter(timeout=0.05)
+        record = WriteData(title='slow')
+        thread, result = self.submit_in_background(committer, record)
+        self.assertTrue(committer.committing.wait(5))
+        # Let the caller's timeout pass while its batch is still committing
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+
+        committer.proceed.set()
+        thread.join(5)
+        self.assertNotIn('error', result)
+        self.assertEqual(result['record'].id, 1)
+        self.assertEqual(committer.stats()['abandoned'], 0)
+
+
+class ReplicationStatusTests(RoleTestCase):
+    server_type = 'read'
+
+    def test_status_before_the_first_replication_does_not_write(self):
+        # As on a SQLITE_READ_ONLY=query_only read node
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA query_only = ON')
+        try:
+            response = self.client.get('/replication/')
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA query_only = OFF')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['position'], 0)
+        self.assertIsNone(response.json()['lag'])
+        self.assertFalse(ReplicationState.objects.exists())
+
+
+class RoleRoutingTests(SimpleTestCase):
+    def routes(self, server_type):
+        try:
+            with override_settings(SERVER_TYPE=server_type, SETTINGS_PROFILE='slim'):
+                return {str(pattern.pattern) for pattern in importlib.reload(project_urls).urlpatterns}
+        finally:
+            importlib.reload(project_urls)
+
+    def test_slim_profile_routes_the_role_apps(self):
+        self.assertIn('database/', self.routes('write'))
+        self.assertNotIn('bulkhead/', self.routes('read'))
+        self.assertNotIn('database/', self.routes('bulkhead'))
+        self.assertTrue({'database/', 'bulkhead/'} <= self.routes('both'))
+
+
+def failing_after(calls, function, error):
+    """Wrap ``function`` so that every call after the first ``calls`` raises ``error``"""
+    made = []
+
+    def wrapper(*args, **kwargs):
+        made.append(1)
+        if len(made) > calls:
+            raise error
+        return function(*args, **kwargs)
+    return wrapper
+
+
+class BatchWriteTests(RoleTestCase):
+    server_type = 'write'
+
+    def rows(self, count, fail_with=None):
+        yield from ((index, {'title': f'row {index}'}) for index in range(count))
+        if fail_with:
+            raise fail_with
+
+    def post_ndjson(self, lines):
+        return self.client.post('/write/batch/', b'\n'.join(lines), content_type='application/x-ndjson')
+
+    def test_undecodable_ndjson_lines_are_row_errors(self):
+        response = self.post_ndjson([b'{"title": "first"}', '{"title": "caf\u00e9"}'.encode('latin-1'),
+                                     b'{not json', b'{"title": "last"}'])
+
+        self.assertEqual(response.status_code, 201)
+        results = response.json()['results']
+        self.assertEqual([result['index'] for result in results if 'id' in result], [0, 3])
+        self.assertEqual([result['index'] for result in results if 'error' in result], [1, 2])
+
+    def test_failed_chunk_reports_the_committed_rows(self):
+        bulk_create = failing_after(1, WriteData.objects.bulk_create, DatabaseError('disk I/O error'))
+        with mock.patch.object(WriteData.objects, 'bulk_create', bulk_create):
+            with self.assertRaises(ingest.BatchInterrupted) as raised:
+                ingest.insert_batch(self.rows(5), chunk_size=2)
+
+        self.assertEqual(raised.exception.resume_from, 2)
+        self.assertEqual([result['index'] for result in raised.exception.results], [0, 1])
+        self.assertEqual(WriteData.objects.count(), 2)
+        self.assertEqual(ChangeLog.objects.count(), 2)
+
+    def test_body_ending_early_keeps_earlier_chunks(self):
+        with self.assertRaises(ingest.BatchInterrupted) as raised:
+            ingest.insert_batch(self.rows(3, fail_with=OSError('client disconnected')), chunk_size=2)
+
+        # Row 2 was read but its chunk never committed
+        self.assertEqual(raised.exception.resume_from, 2)
+        self.assertEqual(WriteData.objects.count(), 2)
+
+    def test_interrupted_batch_response(self):
+        bulk_create = failing_after(1, WriteData.objects.bulk_create, DatabaseError('disk I/O error'))
+        with mock.patch.object(WriteData.objects, 'bulk_create', bulk_create), \
+                mock.patch.object(ingest.insert_batch, '__defaults__', (2,)):
+            response = self.client.post('/write/batch/', json.dumps([{'title': 'a'}, {'title': ''}, {'title': 'b'},
+                                                                      {'title': 'c'}, {'title': 'd'}]),
+                                        content_type='application/json')
+
+        self.assertEqual(response.status_code, 500)
+        body = response.json()
+        self.assertEqual((body['inserted'], body['failed'], body['resume_from']), (2, 1, 3))
+        self.assertEqual([result['index'] for result in body['results']], [0, 1, 2])
+
+
+class ReportTests(RoleTestCase):
+    server_type = 'write'
+
+    def send(self, method, data):
+        return getattr(self.client, method)('/reports/', json.dumps(data), content_type='application/json')
+
+    def create(self, *reports):
+        items = [dict({'title': 'Report', 'author': 'ana', 'department': 'cardio'}, **report) for report in reports]
+        response = self.send('post', items)
+        self.assertEqual(response.status_code, 201, response.content)
+        return [item['id'] for item in response.json()['data']]
+
+    def list(self, query=''):
+        response = self.client.get(f'/reports/?{query}')
+        return response.status_code, response.json()
+
+    def titles(self, query):
+        status, body = self.list(query)
+        self.assertEqual(status, 200, body)
+        return sorted(item['title'] for item in body['data'])
+
+    def test_bulk_create_with_tags(self):
+        first, second = self.create({'title': 'a', 'tags': ['x', 'y', 'x']}, {'title': 'b', 'tags_list': ['y']})
+
+        self.assertEqual(Report.objects.get(id=first).get_tags_list(), ['x', 'y'])
+        self.assertEqual(Report.objects.get(id=second).get_tags_list(), ['y'])
+        response = self.send('post', {'title': 'single', 'author': 'ana', 'department': 'cardio'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['title'], 'single')
+
+    def test_bulk_create_rejects_invalid_items(self):
+        response = self.send('post', [{'title': 'ok', 'author': 'ana', 'department': 'cardio'},
+                                      {'title': 'bad', 'author': 'ana', 'department': 'cardio', 'status': 'lost'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Report.objects.exists())
+
+    def test_partial_bulk_update_and_retag(self):
+        first, second = self.create({'title': 'a', 'tags': ['x']}, {'title': 'b', 'tags': ['y']})
+
+        response = self.send('patch', [{'id': first, 'status': 'resolved'}, {'id': second, 'tags': ['z', 'x']}])
+        self.assertEqual(response.status_code, 200, response.content)
+        first_report, second_report = Report.objects.get(id=first), Report.objects.get(id=second)
+        # Fields that were not sent are kept, tags are only replaced when given
+        self.assertEqual((first_report.status, first_report.title), ('resolved', 'a'))
+        self.assertEqual(first_report.get_tags_list(), ['x'])
+        self.assertEqual((second_report.status, second_report.get_tags_list()), ('open', ['x', 'z']))
+
+    def test_bulk_update_with_unknown_or_missing_ids(self):
+        (first,) = self.create({'title': 'a'})
+
+        response = self.send('patch', [{'id': first, 'status': 'closed'}, {'id': first + 100, 'status': 'closed'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Report.objects.get(id=first).status, 'open')
+        self.assertEqual(self.send('patch', [{'status': 'closed'}]).status_code, 400)
+        self.assertEqual(self.send('patch', {'id': first}).status_code, 400)
+
+    def test_filters(self):
+        self.create({'title': 'a', 'status': 'open', 'priority': 'high', 'due_date': '2026-01-10', 'tags': ['x', 'y']},
+                    {'title': 'b', 'status': 'closed', 'priority': 'low', 'due_date': '2026-02-10', 'tags': ['x']},
+                    {'title': 'c', 'status': 'in_progress', 'priority': 'high', 'department': 'neuro'})
+
+        self.assertEqual(self.titles('tag=x'), ['a', 'b'])
+        self.assertEqual(self.titles('tag=x&tag=y'), ['a'])
+        self.assertEqual(self.titles('status=open,in_progress'), ['a', 'c'])
+        self.assertEqual(self.titles('priority=high&department=cardio'), ['a'])
+        self.assertEqual(self.titles('due_after=2026-01-11'), ['b'])
+        self.assertEqual(self.titles('due_before=2026-01-10'), ['a'])
+
+    def test_bad_filter_values(self):
+        for query in ['status=lost', 'priority=urgent', 'due_after=tomorrow', 'due_before=2026-13-01',
+                      'cursor=garbage', 'page_size=many']:
+            status, body = self.list(query)
+            self.assertEqual(status, 400, query)
+            self.assertIn('error', body)
+
+    def test_list_page_takes_two_queries(self):
+        self.create(*[{'title': f'r{index}', 'tags': [f't{index}', 'shared']} for index in range(15)])
+
+        with self.assertNumQueries(2):
+            status, body = self.list('page_size=10&tag=shared')
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body['data']), 10)
+        self.assertTrue(all(len(item['tags']) == 2 for item in body['data']))
+        with self.assertNumQueries(2):
+            self.list(f"cursor={body['pagination']['next_cursor']}")
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class SummaryTests(RoleTestCase):
+    server_type = 'read'
+
+    def add(self, *moments):
+        return [ReadData.objects.create(title='r', content='c', created_at=moment) for moment in moments]
+
+    def summary(self):
+        return (summary.maintained_total(), summary.bucket_counts('day'), summary.bucket_counts('hour'))
+
+    def test_insert_and_delete_adjust_the_buckets(self):
+        first, second, third = self.add(utc(2026, 10, 17, 23, 30), utc(2026, 10, 18, 9, 5), utc(2026, 10, 18, 9, 55))
+
+        self.assertEqual(self.summary(), (3, [('2026-10-17', 1), ('2026-10-18', 2)],
+                                          [('2026-10-17 23:00', 1), ('2026-10-18 09:00', 2)]))
+        second.delete()
+        ReadData.objects.filter(id=first.id).delete()
+        # Buckets that drop to zero are removed rather than kept at 0
+        self.assertEqual(self.summary(), (1, [('2026-10-18', 1)], [('2026-10-18 09:00', 1)]))
+        third.delete()
+        self.assertEqual(self.summary(), (0, [], []))
+
+    def test_moving_created_at_across_an_hour(self):
+        (record,) = self.add(utc(2026, 10, 17, 23, 10))
+
+        record.created_at = utc(2026, 10, 17, 23, 50)
+        record.save()
+        self.assertEqual(summary.bucket_counts('hour'), [('2026-10-17 23:00', 1)])
+        ReadData.objects.filter(id=record.id).update(created_at=utc(2026, 10, 18, 0, 10))
+        self.assertEqual(self.summary(), (1, [('2026-10-18', 1)], [('2026-10-18 00:00', 1)]))
+
+    def test_rebuild_after_dropping_the_triggers(self):
+        self.add(utc(2026, 10, 17, 8), utc(2026, 10, 18, 8))
+        summary.drop_summary_triggers()
+        self.add(utc(2026, 10, 18, 9), utc(2026, 10, 19, 9))
+        ReadData.objects.filter(created_at__lt=utc(2026, 10, 18)).delete()
+        self.assertEqual(summary.maintained_total(), 2)
+
+        summary.rebuild_summary()
+        self.assertEqual(self.summary(), (3, [('2026-10-18', 2), ('2026-10-19', 1)],
+                                          [('2026-10-18 08:00', 1), ('2026-10-18 09:00', 1), ('2026-10-19 09:00', 1)]))
+        # The triggers are back
+        self.add(utc(2026, 10, 19, 10))
+        self.assertEqual(summary.maintained_total(), 4)
+
+    def test_stats_bounds(self):
+        self.add(utc(2026, 10, 16, 12), utc(2026, 10, 17, 1), utc(2026, 10, 17, 23), utc(2026, 10, 18, 0))
+
+        response = self.client.get('/read/stats/?since=2026-10-17&until=2026-10-17')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_records'], 4)
+        self.assertEqual(response.json()['buckets'], [{'bucket': '2026-10-17', 'count': 2}])
+        # A day bound on hour buckets covers every hour of that day
+        response = self.client.get('/read/stats/?granularity=hour&until=2026-10-17')
+        self.assertEqual([bucket['bucket'] for bucket in response.json()['buckets']],
+                         ['2026-10-16 12:00', '2026-10-17 01:00', '2026-10-17 23:00'])
+        response = self.client.get('/read/stats/?granularity=hour&since=2026-10-17 23:00')
+        self.assertEqual(len(response.json()['buckets']), 2)
+        self.assertEqual(self.client.get('/read/stats/?granularity=week').status_code, 400)
+
+    def test_read_data_total_comes_from_the_summary(self):
+        self.add(utc(2026, 10, 18, 8), utc(2026, 10, 18, 9))
+        # Rows the triggers did not see show that the total is not a COUNT(*)
+        summary.drop_summary_triggers()
+        self.add(utc(2026, 10, 18, 10))
+
+        response = self.client.get('/read/?page=1')
+        self.assertEqual(response.json()['pagination']['total_records'], 2)
+        response = self.client.get('/read/?cursor=&include_total=true')
+        self.assertEqual(response.json()['pagination']['total_records'], 2)
+        with mock.patch.object(views, 'READ_MAINTAINED_TOTALS', False):
+            response = self.client.get('/read/?page=1&page_size=2')
+        self.assertEqual(response.json()['pagination']['total_records'], 3)
+
+
+class ReplicationTests(RoleTestCase):
+    def feed(self, position=0, limit=100):
+        return replication.changes_after(position, limit)
+
+    def replicate(self):
+        def fetch(replicator, position):
+            return self.feed(position, replicator.batch_size)
+        with mock.patch.object(replication.Replicator, 'fetch', fetch):
+            call_command('replicate', '--once', '--source', 'w:1', '--batch-size', '2', stdout=StringIO())
+        return ReplicationState.objects.get(source='w:1')
+
+    def test_feed_pages_after_a_position(self):
+        first = WriteData.objects.create(title='a', content='1')
+        WriteData.objects.create(title='b', content='2')
+        first_id = first.id
+        first.delete()
+
+        feed = self.feed(limit=2)
+        self.assertEqual([change['operation'] for change in feed['changes']], ['upsert', 'upsert'])
+        self.assertEqual((feed['last_position'], feed['head_position']), (2, 3))
+        self.assertIsNotNone(feed['next_logged_at'])
+        feed = self.feed(2)
+        self.assertEqual([(change['record_id'], change['operation']) for change in feed['changes']],
+                         [(first_id, 'delete')])
+        self.assertIsNone(feed['next_logged_at'])
+        self.assertEqual(self.feed(3)['changes'], [])
+        self.assertEqual(self.feed(3)['last_position'], 3)
+
+    def test_changes_collapse_to_the_last_one_per_record(self):
+        record = WriteData.objects.create(title='v1', content='c')
+        record.title = 'v2'
+        record.save()
+        gone = WriteData.objects.create(title='gone', content='c')
+        ReadData.objects.create(id=gone.id, title='gone', content='c')
+        gone.delete()
+        state = ReplicationState.objects.create(source='w:1')
+
+        self.assertEqual(replication.apply_changes(state, self.feed()), 4)
+        self.assertEqual(list(ReadData.objects.values_list('id', 'title')), [(record.id, 'v2')])
+        self.assertEqual((state.position, state.source_head), (4, 4))
+
+    def test_upserts_overwrite_existing_rows(self):
+        record = WriteData.objects.create(title='new', content='fresh')
+        ReadData.objects.create(id=record.id, title='old', content='stale')
+
+        replication.apply_changes(ReplicationState.objects.create(source='w:1'), self.feed())
+        self.assertEqual(ReadData.objects.get(id=record.id).content, 'fresh')
+        self.assertEqual(ReadData.objects.count(), 1)
+
+    def test_watermark_rolls_back_with_a_failed_batch(self):
+        WriteData.objects.create(title='a', content='c')
+        WriteData.objects.create(title='b', content='c').delete()
+        state = ReplicationState.objects.create(source='w:1')
+
+        with mock.patch.object(replication.ReadData.objects, 'filter', side_effect=DatabaseError('locked')):
+            with self.assertRaises(DatabaseError):
+                replication.apply_changes(state, self.feed())
+        state.refresh_from_db()
+        self.assertEqual(state.position, 0)
+        self.assertFalse(ReadData.objects.exists())
+
+    def test_replicate_command_catches_up(self):
+        for index in range(5):
+            WriteData.objects.create(title=f'r{index}', content='c')
+
+        state = self.replicate()
+        self.assertEqual((state.position, state.source_head), (5, 5))
+        self.assertEqual(ReadData.objects.count(), 5)
+        self.assertEqual(replication.replication_lag(state), {'rows': 0, 'seconds': 0.0})
+        WriteData.objects.filter(title='r0').delete()
+        WriteData.objects.first().delete()
+        self.assertEqual(self.replicate().position, 7)
+        self.assertEqual(ReadData.objects.count(), 3)
+
+    def test_lag_is_reported_while_behind(self):
+        for index in range(3):
+            WriteData.objects.create(title=f'r{index}', content='c')
+        ChangeLog.objects.update(logged_at=datetime.now(timezone.utc) - timedelta(seconds=30))
+        state = ReplicationState.objects.create(source=replication.REPLICATION_SOURCE)
+
+        replication.apply_changes(state, self.feed(limit=1))
+        response = self.client.get('/replication/')
+        self.assertEqual(response.json()['position'], 1)
+        self.assertEqual(response.json()['source_head'], 3)
+        lag = response.json()['lag']
+        self.assertEqual(lag['rows'], 2)
+        self.assertGreaterEqual(lag['seconds'], 30)
+
+
+class ConditionalReadTests(RoleTestCase):
+    server_type = 'read'
+
+    def setUp(self):
+        super().setUp()
+        ReadData.objects.create(title='r', content='c')
+
+    def test_matching_validators_skip_the_rows(self):
+        response = self.client.get('/read/')
+        self.assertEqual(response.status_code, 200)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        # Only the data version is read
+        for headers in [{'HTTP_IF_NONE_MATCH': etag}, {'HTTP_IF_MODIFIED_SINCE': last_modified}]:
+            with self.assertNumQueries(1):
+                response = self.client.get('/read/?page=1', **headers)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+            self.assertEqual((response['ETag'], response['Cache-Control']), (etag, 'no-cache'))
+
+    def test_version_bump_invalidates_the_etag(self):
+        etag = self.client.get('/read/')['ETag']
+        ReadData.objects.create(title='new', content='c')
+
+        response = self.client.get('/read/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['pagination']['total_records'], 2)
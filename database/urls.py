@@ -4,6 +4,14 @@ from . import views
 
 urlpatterns = [
     path('write/', views.write_data, name='write_data'),
+    path('write/batch/', views.write_batch, name='write_batch'),
+    path('write/stats/', views.write_stats, name='write_stats'),
     path('read/', views.read_data, name='read_data'),
+    path('export/', views.export_data, name='export_data'),
+    path('reports/', views.reports, name='reports'),
+    path('read/stats/', views.read_stats, name='read_stats'),
+    path('read/cache/', views.read_cache_stats, name='read_cache_stats'),
+    path('changes/', views.change_feed, name='change_feed'),
+    path('replication/', views.replication_status, name='replication_status'),
     path('health/', views.health_check, name='health_check'),
 ]
\ No newline at end of file
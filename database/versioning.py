@@ -0,0 +1,42 @@
+# database/versioning.py
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataVersion
+
+READ_DATA = 'read_data'
+
+
+def get_data_version(name=READ_DATA):
+    """Current version of a table; 0 until its first change"""
+    version = DataVersion.objects.filter(name=name).values_list('version', flat=True).first()
+    return version or 0
+
+
+def get_data_version_info(name=READ_DATA):
+    """``(version, updated_at)`` of a table; ``(0, None)`` until its first change"""
+    return DataVersion.objects.filter(name=name).values_list('version', 'updated_at').first() or (0, None)
+
+
+def version_etag(version, updated_at):
+    """Strong ETag for a response computed at ``version``.
+
+    The bump timestamp is included so read servers with independently
+    counted versions never hand out the same tag for different data.
+    """
+    stamp = int(updated_at.timestamp() * 1_000_000) if updated_at else 0
+    return f'"{version}.{stamp:x}"'
+
+
+def bump_data_version(name=READ_DATA):
+    """Mark a table as changed so version-keyed caches drop their entries.
+
+    Called from ReadData signals, and explicitly after bulk operations that
+    bypass them (bulk_create, queryset update/delete).
+    """
+    updated = DataVersion.objects.filter(name=name).update(
+        version=F('version') + 1,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        DataVersion.objects.get_or_create(name=name, defaults={'version': 1})
@@ -1,14 +1,37 @@
 # database/views.py
 import os
-from django.http import JsonResponse
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.utils.dateparse import parse_date, parse_datetime
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.core.paginator import Paginator
-from .models import WriteData, ReadData
+from rest_framework.exceptions import ValidationError
+from .export import EXPORT_CHUNK_SIZE, csv_stream, iter_export_batches, ndjson_stream
+from .group_commit import WRITE_GROUP_COMMIT, group_committer
+from .ingest import BatchInterrupted, InvalidBatch, insert_batch, iter_batch_rows
+from .models import Report, WriteData, ReadData
+from .replication import (
+    REPLICATION_MAX_BATCH_SIZE, REPLICATION_SOURCE, changes_after, find_replication_state, replication_lag
+)
+from .projection import InvalidProjection, Projection
+from .pagination import CachedCountPaginator, InvalidCursor, cached_count, keyset_page, parse_page_size
+from .reports import InvalidReportFilter, filter_reports
+from .serializers import ReportSerializer
+from .search import count_matches, search_records
+from .summary import BUCKET_TABLES, bucket_counts, maintained_total
+from .response_cache import READ_CACHE_ENABLED, response_cache
+from .versioning import get_data_version, get_data_version_info, version_etag
 import json
 
-# Get server type from environment variable
-SERVER_TYPE = os.environ.get('SERVER_TYPE', 'both')  # 'write', 'read', or 'both'
+# Role of this server: 'write', 'read' or 'both' serve the matching handlers
+SERVER_TYPE = settings.SERVER_TYPE
+# Take unfiltered list totals from the trigger-maintained summary table instead of COUNT(*)
+READ_MAINTAINED_TOTALS = os.environ.get('READ_MAINTAINED_TOTALS', 'True').lower() == 'true'
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -28,11 +51,16 @@ def write_data(request):
         if not title:
             return JsonResponse({'error': 'Title is required'}, status=400)
         
-        # Create new record
-        write_record = WriteData.objects.create(
-            title=title,
-            content=content
-        )
+        if WRITE_GROUP_COMMIT:
+            # Share a transaction with concurrent writes; returns after the commit
+            write_record = group_committer.submit(WriteData(title=title, content=content))
+        else:
+            # Create new record (its change log entry commits with it)
+            with transaction.atomic():
+                write_record = WriteData.objects.create(
+                    title=title,
+                    content=content
+                )
         
         return JsonResponse({
             'id': write_record.id,
@@ -44,9 +72,53 @@ def write_data(request):
         
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    except TimeoutError as e:
+        # Group commit gave up before the row was written, so retrying is safe
+        return JsonResponse({'error': str(e)}, status=503)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def write_batch(request):
+    """Insert many records from a JSON array or an NDJSON stream - only on write servers"""
+    if SERVER_TYPE not in ['write', 'both']:
+        return JsonResponse({
+            'error': 'Write operations not available on this server',
+            'server_type': SERVER_TYPE
+        }, status=403)
+    
+    try:
+        results = insert_batch(iter_batch_rows(request))
+    except InvalidBatch as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except BatchInterrupted as e:
+        # Earlier chunks are committed: report their ids so a retry resends only the rest
+        inserted = sum(1 for result in e.results if 'id' in result)
+        return JsonResponse({
+            'error': str(e),
+            'inserted': inserted,
+            'failed': len(e.results) - inserted,
+            'results': e.results,
+            'resume_from': e.resume_from,
+            'message': f'{inserted} records written before the batch was interrupted'
+        }, status=500)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    
+    inserted = sum(1 for result in results if 'id' in result)
+    return JsonResponse({
+        'inserted': inserted,
+        'failed': len(results) - inserted,
+        'results': results,
+        'message': f'{inserted} records written'
+    }, status=201 if inserted else 400)
+
+@require_http_methods(["GET"])
+def write_stats(request):
+    """Group commit batch size and flush latency metrics"""
+    return JsonResponse(group_committer.stats())
+
 @require_http_methods(["GET"])
 def read_data(request):
     """Handle read operations - only available on read servers"""
@@ -56,29 +128,120 @@ def read_data(request):
             'server_type': SERVER_TYPE
         }, status=403)
     
+    try:
+        # Validators come from the data version, so unchanged data is answered with a
+        # 304 before any row is read or serialized
+        version, modified_at = get_data_version_info()
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    etag = version_etag(version, modified_at)
+    # HTTP dates have whole-second precision; ETag is the exact validator
+    last_modified = int(modified_at.timestamp()) if modified_at else None
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return set_validators(not_modified, etag, last_modified)
+    
+    if READ_CACHE_ENABLED:
+        # Serve identical queries from the cache while the data version is unchanged
+        cache_key = response_cache.make_key(request.GET)
+        body = response_cache.get(cache_key, version)
+        if body is not None:
+            response = HttpResponse(body, content_type='application/json')
+        else:
+            response = query_read_data(request)
+            if response.status_code == 200:
+                response_cache.set(cache_key, version, response.content)
+    else:
+        response = query_read_data(request)
+    
+    if response.status_code == 200:
+        set_validators(response, etag, last_modified)
+    return response
+
+def set_validators(response, etag, last_modified):
+    """Attach the read_data validators; clients may keep the body but must revalidate it"""
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def query_read_data(request):
+    """Answer a read_data request from the database"""
     try:
         # Get query parameters
         record_id = request.GET.get('id')
         page = request.GET.get('page', 1)
-        page_size = request.GET.get('page_size', 10)
+        cursor = request.GET.get('cursor')
+        query = request.GET.get('q')
+        include_total = request.GET.get('include_total', '').lower() == 'true'
         
-        # If specific ID requested
+        # Sparse fieldsets: ?fields=id,title loads only those columns, preview=N truncates content
+        try:
+            projection = Projection.from_query(request.GET)
+        except InvalidProjection as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        
+        # If specific ID requested (?id=N&fields=content for a content-only lookup)
         if record_id:
             try:
-                record = ReadData.objects.get(id=record_id)
-                return JsonResponse({
-                    'id': record.id,
-                    'title': record.title,
-                    'content': record.content,
-                    'created_at': record.created_at.isoformat(),
-                    'updated_at': record.updated_at.isoformat()
-                })
+                record = projection.apply(ReadData.objects.all()).get(id=record_id)
+                return JsonResponse(projection.serialize(record))
             except ReadData.DoesNotExist:
                 return JsonResponse({'error': 'Record not found'}, status=404)
         
-        # Get all records with pagination
-        all_records = ReadData.objects.all()
-        paginator = Paginator(all_records, page_size)
+        try:
+            page_size = parse_page_size(request.GET.get('page_size'))
+        except ValueError:
+            return JsonResponse({'error': 'Invalid page size'}, status=400)
+        
+        # Full-text search: ranked matches for every term in q
+        if query is not None:
+            try:
+                page = int(page)
+                if page < 1:
+                    raise ValueError
+            except ValueError:
+                return JsonResponse({'error': 'Invalid page number'}, status=400)
+            snippets = request.GET.get('snippets', '').lower() == 'true'
+            records = search_records(query, (page - 1) * page_size, page_size + 1,
+                                     snippets=snippets, projection=projection)
+            data = []
+            for record in records[:page_size]:
+                item = projection.serialize(record)
+                item['rank'] = record.rank
+                if snippets:
+                    item['snippet'] = record.snippet
+                data.append(item)
+            pagination = {
+                'current_page': page,
+                'page_size': page_size,
+                'has_next': len(records) > page_size,
+                'has_previous': page > 1
+            }
+            if include_total:
+                pagination['total_records'] = count_matches(query)
+            return JsonResponse({'query': query, 'data': data, 'pagination': pagination})
+        
+        all_records = projection.apply(ReadData.objects.all())
+        # Cached totals are only shared while the data version is unchanged
+        count_key = f'read_data:v{get_data_version()}'
+        
+        # Cursor (keyset) pagination: ?cursor= for the first page, then next_cursor/prev_cursor
+        if cursor is not None or request.GET.get('pagination') == 'cursor':
+            try:
+                records, pagination = keyset_page(all_records, cursor, page_size)
+            except InvalidCursor:
+                return JsonResponse({'error': 'Invalid cursor'}, status=400)
+            if include_total:
+                pagination['total_records'] = read_data_total(all_records, count_key)
+            return JsonResponse({
+                'data': [projection.serialize(record) for record in records],
+                'pagination': pagination
+            })
+        
+        # Page number pagination (compatibility mode) with a cached total
+        paginator = CachedCountPaginator(all_records, page_size, count_key=count_key, counter=read_data_total)
         
         try:
             records = paginator.page(page)
@@ -86,13 +249,7 @@ def read_data(request):
             return JsonResponse({'error': 'Invalid page number'}, status=400)
         
         # Serialize records
-        data = [{
-            'id': record.id,
-            'title': record.title,
-            'content': record.content,
-            'created_at': record.created_at.isoformat(),
-            'updated_at': record.updated_at.isoformat()
-        } for record in records]
+        data = [projection.serialize(record) for record in records]
         
         return JsonResponse({
             'data': data,
@@ -108,6 +265,197 @@ def read_data(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+def read_data_total(queryset, count_key):
+    """Total rows of read_data: the maintained count when available, else a cached COUNT(*)"""
+    total = maintained_total() if READ_MAINTAINED_TOTALS else None
+    return total if total is not None else cached_count(queryset, count_key)
+
+@require_http_methods(["GET"])
+def read_stats(request):
+    """Total and per-day/hour record counts from the summary tables - only on read servers"""
+    if SERVER_TYPE not in ['read', 'both']:
+        return JsonResponse({
+            'error': 'Read operations not available on this server',
+            'server_type': SERVER_TYPE
+        }, status=403)
+    
+    granularity = request.GET.get('granularity', 'day').lower()
+    if granularity not in BUCKET_TABLES:
+        return JsonResponse({'error': 'Invalid granularity. Use day or hour'}, status=400)
+    
+    try:
+        total = maintained_total()
+        if total is None:
+            return JsonResponse({'error': 'Summary tables are not installed, run migrate'}, status=503)
+        buckets = bucket_counts(granularity, request.GET.get('since'), request.GET.get('until'))
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({
+        'total_records': total,
+        'granularity': granularity,
+        'timezone': 'UTC',
+        'buckets': [{'bucket': bucket, 'count': count} for bucket, count in buckets]
+    })
+
+def parse_export_bound(value):
+    """Parse an ISO datetime or date query parameter (dates mean midnight UTC)"""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        moment = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+@require_http_methods(["GET"])
+def export_data(request):
+    """Stream every record (or a created_at range) as NDJSON or CSV - only on read servers"""
+    if SERVER_TYPE not in ['read', 'both']:
+        return JsonResponse({
+            'error': 'Read operations not available on this server',
+            'server_type': SERVER_TYPE
+        }, status=403)
+    
+    export_format = request.GET.get('format', 'ndjson').lower()
+    if export_format not in ('ndjson', 'csv'):
+        return JsonResponse({'error': 'Invalid format. Use ndjson or csv'}, status=400)
+    try:
+        since = parse_export_bound(request.GET.get('since'))
+        until = parse_export_bound(request.GET.get('until'))
+        chunk_size = min(int(request.GET.get('chunk_size', EXPORT_CHUNK_SIZE)), EXPORT_CHUNK_SIZE)
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be positive')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    batches = iter_export_batches(since, until, chunk_size)
+    if export_format == 'csv':
+        response = StreamingHttpResponse(csv_stream(batches), content_type='text/csv; charset=utf-8')
+    else:
+        response = StreamingHttpResponse(ndjson_stream(batches), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="read_data.{export_format}"'
+    return response
+
+@csrf_exempt
+@require_http_methods(["GET", "POST", "PATCH"])
+def reports(request):
+    """List, create and bulk update reports - only available on write servers
+
+    GET filters by department/status/priority/tag/due_after/due_before with
+    cursor pagination; POST takes one report or an array; PATCH takes an
+    array of partial reports identified by id.
+    """
+    if SERVER_TYPE not in ['write', 'both']:
+        return JsonResponse({
+            'error': 'Report operations not available on this server',
+            'server_type': SERVER_TYPE
+        }, status=403)
+    
+    if request.method == 'GET':
+        return list_reports(request)
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    
+    try:
+        if request.method == 'POST':
+            serializer = ReportSerializer(data=data, many=isinstance(data, list))
+        else:
+            if not isinstance(data, list) or not all(
+                    isinstance(item, dict) and isinstance(item.get('id'), int) for item in data):
+                return JsonResponse({'error': 'Expected an array of reports with integer ids'}, status=400)
+            existing = Report.objects.filter(id__in=[item['id'] for item in data])
+            serializer = ReportSerializer(existing, data=data, many=True, partial=True)
+        if not serializer.is_valid():
+            return JsonResponse({'error': 'Invalid report data', 'details': serializer.errors}, status=400)
+        serializer.save()
+    except ValidationError as e:
+        return JsonResponse({'error': 'Invalid report data', 'details': e.detail}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    
+    return JsonResponse({'data': serializer.data} if isinstance(data, list) else serializer.data,
+                        status=201 if request.method == 'POST' else 200)
+
+def list_reports(request):
+    """One page of filtered reports; two queries whatever the page size"""
+    try:
+        page_size = parse_page_size(request.GET.get('page_size'))
+        queryset = filter_reports(request.GET)
+        records, pagination = keyset_page(queryset, request.GET.get('cursor'), page_size)
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    except InvalidReportFilter as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid page size'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+    
+    if request.GET.get('include_total', '').lower() == 'true':
+        pagination['total_records'] = queryset.count()
+    return JsonResponse({
+        'data': ReportSerializer(records, many=True).data,
+        'pagination': pagination
+    })
+
+@require_http_methods(["GET"])
+def read_cache_stats(request):
+    """Response cache hit, miss and eviction counters"""
+    return JsonResponse(response_cache.stats())
+
+@require_http_methods(["GET"])
+def change_feed(request):
+    """Change feed pulled by read servers - only available on write servers"""
+    if SERVER_TYPE not in ['write', 'both']:
+        return JsonResponse({
+            'error': 'Change feed not available on this server',
+            'server_type': SERVER_TYPE
+        }, status=403)
+    
+    try:
+        position = int(request.GET.get('after', 0))
+        limit = min(int(request.GET.get('limit', 500)), REPLICATION_MAX_BATCH_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid position or limit'}, status=400)
+    
+    return JsonResponse(changes_after(position, limit))
+
+@require_http_methods(["GET"])
+def replication_status(request):
+    """Replication watermark and lag - only available on read servers"""
+    if SERVER_TYPE not in ['read', 'both']:
+        return JsonResponse({
+            'error': 'Replication status not available on this server',
+            'server_type': SERVER_TYPE
+        }, status=403)
+    
+    # Read-only: query_only and immutable read nodes cannot create the watermark row
+    state = find_replication_state()
+    if state is None:
+        # The replicate command has not run yet, so the lag is unknown
+        return JsonResponse({
+            'source': REPLICATION_SOURCE,
+            'position': 0,
+            'source_head': None,
+            'last_applied_at': None,
+            'lag': None
+        })
+    return JsonResponse({
+        'source': state.source,
+        'position': state.position,
+        'source_head': state.source_head,
+        'last_applied_at': state.last_applied_at.isoformat() if state.last_applied_at else None,
+        'lag': replication_lag(state)
+    })
+
 def health_check(request):
     """Health check endpoint"""
     return JsonResponse({
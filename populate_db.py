@@ -1,8 +1,12 @@
 # populate_db.py
+import argparse
 import os
 import django
 import sys
 import random
+import time
+from datetime import timedelta
+from multiprocessing import Pool
 
 # Add the project directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -11,7 +15,15 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ExpMantenibilidad2.settings')
 django.setup()
 
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
 from database.models import WriteData, ReadData
+from database.replication import log_changes
+from database.search import drop_search_triggers, rebuild_search_index
+from database.summary import drop_summary_triggers, rebuild_summary
+from database.versioning import bump_data_version
 from bulkhead.models import ServiceStatus
 
 # Palabras médicas comunes para generar contenido más realista
@@ -26,28 +38,103 @@ MEDICAL_WORDS = [
     'hospitalización', 'urgencia', 'evaluación', 'síndrome', 'lesión'
 ]
 
-def generate_medical_text(word_count):
-    return ' '.join(random.choices(MEDICAL_WORDS, k=word_count)).capitalize()
+def generate_medical_text(word_count, rng=random):
+    return ' '.join(rng.choices(MEDICAL_WORDS, k=word_count)).capitalize()
 
-def populate_database():
+def generate_chunk(task):
+    """Generate (title, content, age_seconds) rows for one chunk.
+
+    Each chunk has its own RNG derived from the seed and the chunk index, so
+    the output is identical whatever the number of worker processes.
+    """
+    seed, chunk_index, size, max_age_seconds = task
+    rng = random.Random(f'{seed}:{chunk_index}')
+    return [(generate_medical_text(rng.randint(3, 6), rng),
+             generate_medical_text(rng.randint(15, 30), rng),
+             rng.uniform(0, max_age_seconds))
+            for _ in range(size)]
+
+def generate_chunks(rows, seed, chunk_size, workers, days):
+    """Yield generated chunks in order, using a process pool when workers > 1"""
+    tasks = [(seed, index, min(chunk_size, rows - start), days * 86400)
+             for index, start in enumerate(range(0, rows, chunk_size))]
+    if workers <= 1:
+        yield from map(generate_chunk, tasks)
+        return
+    with Pool(workers) as pool:
+        yield from pool.imap(generate_chunk, tasks)
+
+def drop_indexes(model):
+    with connection.schema_editor() as schema_editor:
+        for index in model._meta.indexes:
+            schema_editor.remove_index(model, index)
+
+def create_indexes(model):
+    with connection.schema_editor() as schema_editor:
+        for index in model._meta.indexes:
+            schema_editor.add_index(model, index)
+
+def load_records(model, rows, seed, chunk_size, workers, days, defer_indexes):
+    """Bulk insert generated records, one transaction per chunk"""
+    print(f"Populating {model._meta.db_table} with {rows} medical records "
+          f"(seed={seed}, chunk_size={chunk_size}, workers={workers})...")
+    if defer_indexes:
+        drop_indexes(model)
+        if model is ReadData:
+            drop_search_triggers()
+            drop_summary_triggers()
+    
+    loaded_at = timezone.now()
+    if model is ReadData:
+        # Replication upserts by WriteData id, so rows seeded straight into a read
+        # node take a block of ids below zero (and below earlier seeds) instead
+        next_id = min(ReadData.objects.aggregate(lowest=Min('id'))['lowest'] or 0, 0) - rows
+    started = time.monotonic()
+    inserted = 0
+    try:
+        for chunk in generate_chunks(rows, seed, chunk_size, workers, days):
+            records = [model(title=title, content=content, created_at=loaded_at - timedelta(seconds=age))
+                       for title, content, age in chunk]
+            if model is ReadData:
+                for record in records:
+                    record.id = next_id
+                    next_id += 1
+            with transaction.atomic():
+                created = model.objects.bulk_create(records)
+                if model is WriteData:
+                    # Seeded writes replicate to the read nodes like any other write
+                    log_changes(created)
+            inserted += len(records)
+            elapsed = time.monotonic() - started
+            print(f"  {inserted}/{rows} rows ({inserted / elapsed:,.0f} rows/s)", flush=True)
+    finally:
+        if defer_indexes:
+            print("Creating deferred indexes...")
+            index_started = time.monotonic()
+            create_indexes(model)
+            if model is ReadData:
+                rebuild_search_index()
+                rebuild_summary()
+            print(f"  indexes created in {time.monotonic() - index_started:.2f}s")
+    
+    elapsed = time.monotonic() - started
+    print(f"Inserted {inserted} rows in {elapsed:.2f}s ({inserted / elapsed if elapsed else 0:,.0f} rows/s)")
+
+def populate_database(rows=2000, seed=None, chunk_size=5000, workers=1, days=0, defer_indexes=False):
     """Populate database with sample medical data"""
     
-    server_type = os.environ.get('SERVER_TYPE', 'bulkhead')
+    server_type = settings.SERVER_TYPE
+    if seed is None:
+        seed = random.randrange(2 ** 32)
 
     if server_type == 'write':
-        print("Populating write database with 2000 medical records...")
-        for _ in range(2000):
-            title = generate_medical_text(random.randint(3, 6))
-            content = generate_medical_text(random.randint(15, 30))
-            WriteData.objects.create(title=title, content=content)
+        load_records(WriteData, rows, seed, chunk_size, workers, days, defer_indexes)
         print(f"Total write records: {WriteData.objects.count()}")
 
     elif server_type == 'read':
-        print("Populating read database with 2000 medical records...")
-        for _ in range(2000):
-            title = generate_medical_text(random.randint(3, 6))
-            content = generate_medical_text(random.randint(15, 30))
-            ReadData.objects.create(title=title, content=content)
+        load_records(ReadData, rows, seed, chunk_size, workers, days, defer_indexes)
+        # bulk_create skips the signals that invalidate read caches
+        bump_data_version()
         print(f"Total read records: {ReadData.objects.count()}")
 
     else:  # bulkhead
@@ -62,5 +149,20 @@ def populate_database():
         )
         print("Service status initialized")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Seed the database of the current SERVER_TYPE')
+    parser.add_argument('--rows', type=int, default=2000, help='number of records to insert')
+    parser.add_argument('--seed', type=int, default=None, help='seed for deterministic output')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='rows per bulk_create transaction')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='processes generating text (1 disables the pool)')
+    parser.add_argument('--days', type=float, default=0,
+                        help='spread created_at uniformly over the last N days')
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help='drop secondary indexes while loading and rebuild them afterwards')
+    return parser.parse_args()
+
 if __name__ == '__main__':
-    populate_database()
+    args = parse_args()
+    populate_database(rows=args.rows, seed=args.seed, chunk_size=args.chunk_size,
+                      workers=args.workers, days=args.days, defer_indexes=args.defer_indexes)
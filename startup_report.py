@@ -0,0 +1,128 @@
+# startup_report.py
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ROLES = ('bulkhead', 'write', 'read')
+PROFILES = ('full', 'slim')
+# A cheap endpoint every profile of the role serves, used to time per-request overhead
+PROBE_PATHS = {'bulkhead': '/metrics', 'write': '/database/health/', 'read': '/database/health/'}
+
+
+def measure(path, requests):
+    """Runs in a fresh interpreter: time Django setup, handler load and requests"""
+    started = time.perf_counter()
+    sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ExpMantenibilidad2.settings')
+    import django
+    django.setup()
+    setup_done = time.perf_counter()
+
+    from django.core.wsgi import get_wsgi_application
+    from django.urls import get_resolver
+    handler = get_wsgi_application()
+    handler_done = time.perf_counter()
+    get_resolver().url_patterns
+    urls_done = time.perf_counter()
+
+    def call():
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+            'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+        }
+        statuses = []
+        response = handler(environ, lambda status, headers: statuses.append(status))
+        b''.join(response)
+        response.close()
+        return statuses[0]
+
+    first_status = call()
+    first_done = time.perf_counter()
+    for _ in range(requests):
+        call()
+    requests_done = time.perf_counter()
+
+    from django.conf import settings
+    return {
+        'installed_apps': len(settings.INSTALLED_APPS),
+        'middleware': len(settings.MIDDLEWARE),
+        'modules_loaded': len(sys.modules),
+        'setup_ms': round((setup_done - started) * 1000, 2),
+        'handler_ms': round((handler_done - setup_done) * 1000, 2),
+        'urlconf_ms': round((urls_done - handler_done) * 1000, 2),
+        'first_request_ms': round((first_done - urls_done) * 1000, 2),
+        'startup_ms': round((first_done - started) * 1000, 2),
+        'request_us': round((requests_done - first_done) / requests * 1_000_000, 1),
+        'probe': f'{path} -> {first_status}',
+    }
+
+
+def run_child(role, profile, requests, workdir):
+    env = dict(os.environ, SERVER_TYPE=role, SETTINGS_PROFILE=profile, METRICS_ENABLED='True',
+               DATABASE_PATH=os.path.join(workdir, f'{role}_db.sqlite3'))
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', PROBE_PATHS[role],
+                             '--requests', str(requests)],
+                            cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def best_of(runs):
+    """Keep the fastest of several runs for every timing"""
+    best = dict(runs[0])
+    for run in runs[1:]:
+        for key, value in run.items():
+            if key.endswith('_ms') or key.endswith('_us'):
+                best[key] = min(best[key], value)
+    return best
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Compare startup and per-request cost of the settings profiles per role')
+    parser.add_argument('--requests', type=int, default=2000, help='requests timed per run')
+    parser.add_argument('--repeat', type=int, default=3, help='fresh interpreters per role and profile')
+    parser.add_argument('--output', help='also write the report as JSON to this file')
+    parser.add_argument('--child', metavar='PATH', help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        print(json.dumps(measure(args.child, args.requests)))
+        return
+
+    report = {}
+    with tempfile.TemporaryDirectory(prefix='startup-report-') as workdir:
+        for role in ROLES:
+            report[role] = {profile: best_of([run_child(role, profile, args.requests, workdir)
+                                              for _ in range(args.repeat)])
+                            for profile in PROFILES}
+
+    print(f"{'role':<10}{'profile':<9}{'apps':>6}{'mw':>5}{'modules':>9}{'setup ms':>10}{'handler ms':>12}"
+          f"{'urls ms':>9}{'startup ms':>12}{'req us':>9}")
+    for role, profiles in report.items():
+        for profile, result in profiles.items():
+            print(f"{role:<10}{profile:<9}{result['installed_apps']:>6}{result['middleware']:>5}"
+                  f"{result['modules_loaded']:>9}{result['setup_ms']:>10}{result['handler_ms']:>12}"
+                  f"{result['urlconf_ms']:>9}{result['startup_ms']:>12}{result['request_us']:>9}")
+        full, slim = profiles['full'], profiles['slim']
+        print(f"{'':<10}{'saved':<9}{'':>6}{'':>5}{full['modules_loaded'] - slim['modules_loaded']:>9}"
+              f"{'':>10}{'':>12}{'':>9}"
+              f"{1 - slim['startup_ms'] / full['startup_ms']:>12.0%}{1 - slim['request_us'] / full['request_us']:>9.0%}")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+        print(f'\nReport written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()